@@ -2,7 +2,9 @@
 Роуты для админа (защищенные эндпоинты)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from pydantic import TypeAdapter
+from sqlalchemy import case, func, tuple_
 from sqlalchemy.orm import Session
 from datetime import timedelta, timezone
 from datetime import datetime as dt
@@ -13,17 +15,96 @@ from schemas.auth import LoginRequest, Token
 from schemas.letter import (
     LetterDetailResponse,
     LetterListResponse,
+    LetterListItem,
+    LetterSummaryListResponse,
     LetterEditRequest,
-    LetterApprovalRequest
+    LetterApprovalRequest,
+    PageCursor,
+    SortBy,
+    SortOrder
 )
 from schemas.history import HistoryResponse, HistoryItem
-from models.letter import Letter, LetterStatus, LetterUrgency, LetterStyle
-from services.auth import authenticate_admin, create_access_token, get_current_admin
-from services.email_sender import EmailSender
+from models.letter import Letter, LetterStatus, LetterUrgency
+from services.auth import authenticate_admin, create_access_token, require_admin
+from services.email_sender import EmailSender, get_email_sender
 from core.config import settings
 
 router = APIRouter()
 
+# Защищенные эндпоинты: токен проверяет AdminAuthMiddleware, require_admin — страховка
+# (и схема Bearer в OpenAPI). Подключается к router в конце модуля, после объявления маршрутов
+protected_router = APIRouter(dependencies=[Security(require_admin)])
+
+# Допустимые значения фильтров, вычисленные один раз при загрузке модуля
+_STATUS_VALUES = tuple(s.value for s in LetterStatus)
+_URGENCY_VALUES = tuple(u.value for u in LetterUrgency)
+_STATUS_BY_VALUE = {s.value: s for s in LetterStatus}
+_URGENCY_BY_VALUE = {u.value: u for u in LetterUrgency}
+
+# Приоритет срочности для сортировки на стороне БД (HIGH → 0, MEDIUM → 1, LOW → 2)
+_URGENCY_PRIORITY = case(
+    (Letter.urgency == LetterUrgency.HIGH, 0),
+    (Letter.urgency == LetterUrgency.MEDIUM, 1),
+    (Letter.urgency == LetterUrgency.LOW, 2),
+    else_=999,
+)
+
+# Колонки сортировки списка писем: id в конце дает стабильный порядок между страницами
+# (для received_date он же используется в курсоре)
+_SORT_COLUMNS = {
+    SortBy.URGENCY: (_URGENCY_PRIORITY, Letter.id),
+    SortBy.RECEIVED_DATE: (Letter.received_date, Letter.id),
+    SortBy.DEADLINE: (Letter.reply_deadline, Letter.id),
+}
+_ORDER_BY = {
+    SortOrder.ASC: lambda columns: [c.asc() for c in columns],
+    SortOrder.DESC: lambda columns: [c.desc() for c in columns],
+}
+
+# Валидация списков ORM-объектов одним вызовом pydantic-core вместо цикла по строкам
+_SUMMARY_LIST_ADAPTER = TypeAdapter(list[LetterListItem])
+_HISTORY_LIST_ADAPTER = TypeAdapter(list[HistoryItem])
+
+
+def _count(query) -> int:
+    """Считает строки запроса через COUNT по первичному ключу, без ORDER BY и подзапроса"""
+    return query.with_entities(func.count(Letter.id)).order_by(None).scalar()
+
+
+def _get_letter_or_404(db: Session, letter_id: int) -> Letter:
+    """Получает письмо по первичному ключу (через identity map сессии) или 404"""
+    letter = db.get(Letter, letter_id)
+    if letter is None:
+        raise HTTPException(status_code=404, detail="Письмо не найдено")
+    return letter
+
+
+def _use_cursor(after_received_date: Optional[dt], after_id: Optional[int]) -> bool:
+    """Проверяет, что курсор передан целиком (оба параметра) или не передан вовсе"""
+    if after_received_date is None and after_id is None:
+        return False
+    if after_received_date is None or after_id is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Для курсорной пагинации укажите оба параметра: after_received_date и after_id"
+        )
+    return True
+
+
+def _after_cursor(query, after_received_date: dt, after_id: int, ascending: bool = False):
+    """Keyset-пагинация: письма строго после курсора в порядке (received_date, id)"""
+    position = tuple_(Letter.received_date, Letter.id)
+    cursor = tuple_(after_received_date, after_id)
+    return query.filter(position > cursor if ascending else position < cursor)
+
+
+def _next_cursor(letters: list, limit: Optional[int]) -> Optional[PageCursor]:
+    """Курсор на следующую страницу, если текущая страница заполнена целиком"""
+    if not limit or len(letters) < limit:
+        return None
+    last = letters[-1]
+    return PageCursor(after_received_date=last.received_date, after_id=last.id)
+
 
 @router.post("/auth/login", response_model=Token)
 async def login(login_request: LoginRequest):
@@ -46,116 +127,139 @@ async def login(login_request: LoginRequest):
     return Token(access_token=access_token, token_type="bearer")
 
 
-@router.get("/letters", response_model=LetterListResponse)
+def _filter_and_sort_letters(query, status: Optional[str], urgency: Optional[str], sort_by: SortBy, sort_order: SortOrder):
+    """Применяет к запросу фильтры и сортировку списка писем (ошибки параметров → 400)"""
+    if status:
+        status_enum = _STATUS_BY_VALUE.get(status)
+        if status_enum is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Неверный статус. Доступные статусы: {list(_STATUS_VALUES)}"
+            )
+        query = query.filter(Letter.status == status_enum)
+    
+    if urgency:
+        urgency_enum = _URGENCY_BY_VALUE.get(urgency)
+        if urgency_enum is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Неверная срочность. Доступные значения: {list(_URGENCY_VALUES)}"
+            )
+        query = query.filter(Letter.urgency == urgency_enum)
+    
+    query = query.order_by(*_ORDER_BY[sort_order](_SORT_COLUMNS[sort_by]))
+    return query
+
+
+def _letters_page(
+    query,
+    status: Optional[str],
+    urgency: Optional[str],
+    sort_by: SortBy,
+    sort_order: SortOrder,
+    skip: int,
+    limit: Optional[int],
+    after_received_date: Optional[dt],
+    after_id: Optional[int]
+) -> tuple[list, int]:
+    """Возвращает страницу списка писем и общее количество с учетом фильтров"""
+    use_cursor = _use_cursor(after_received_date, after_id)
+    if use_cursor and sort_by != SortBy.RECEIVED_DATE:
+        raise HTTPException(
+            status_code=400,
+            detail="Курсорная пагинация доступна только при sort_by=received_date"
+        )
+    
+    query = _filter_and_sort_letters(query, status, urgency, sort_by, sort_order)
+    
+    total = _count(query)
+    if use_cursor:
+        query = _after_cursor(query, after_received_date, after_id, ascending=sort_order == SortOrder.ASC)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all(), total
+
+
+@protected_router.get("/letters", response_model=LetterListResponse)
 async def get_all_letters(
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
     urgency: Optional[str] = Query(None, description="Фильтр по срочности"),
-    sort_by: str = Query("urgency", description="Сортировка: urgency, received_date, deadline"),
-    sort_order: str = Query("desc", description="Порядок сортировки: asc, desc"),
-    db: Session = Depends(get_db),
-    current_admin: bool = Depends(get_current_admin)
+    sort_by: SortBy = Query(SortBy.URGENCY, description="Сортировка: urgency, received_date, deadline"),
+    sort_order: SortOrder = Query(SortOrder.DESC, description="Порядок сортировки: asc, desc"),
+    skip: int = Query(0, ge=0, description="Сколько писем пропустить"),
+    limit: Optional[int] = Query(None, ge=1, description="Максимальное количество писем (по умолчанию все)"),
+    after_received_date: Optional[dt] = Query(None, description="Курсор: received_date последнего письма предыдущей страницы"),
+    after_id: Optional[int] = Query(None, description="Курсор: id последнего письма предыдущей страницы"),
+    db: Session = Depends(get_db)
 ):
     """
     Получает список всех писем с возможностью фильтрации и сортировки.
-    Возвращает все письма без ограничений.
+    Сортировка и пагинация выполняются на стороне БД.
     Требует авторизации админа.
     
     - **status**: pending_approval, approved, sent
     - **urgency**: low, medium, high
     - **sort_by**: urgency (по умолчанию), received_date, deadline
     - **sort_order**: desc (по умолчанию), asc
+    - **skip** / **limit**: пагинация (без limit возвращаются все письма)
+    - **after_received_date** / **after_id**: курсор из next_cursor вместо skip (только для sort_by=received_date)
     """
     try:
-        query = db.query(Letter)
-        
-        if status:
-            try:
-                status_enum = LetterStatus(status)
-                query = query.filter(Letter.status == status_enum)
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Неверный статус. Доступные статусы: {[s.value for s in LetterStatus]}"
-                )
-        
-        if urgency:
-            try:
-                urgency_enum = LetterUrgency(urgency)
-                query = query.filter(Letter.urgency == urgency_enum)
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Неверная срочность. Доступные значения: {[u.value for u in LetterUrgency]}"
-                )
-        
-        urgency_order = {
-            LetterUrgency.HIGH: 0,
-            LetterUrgency.MEDIUM: 1,
-            LetterUrgency.LOW: 2
-        }
-        
-        if sort_by == "urgency":
-            letters = query.all()
-            if sort_order == "asc":
-                letters.sort(key=lambda x: urgency_order.get(x.urgency, 999))
-            else:
-                letters.sort(key=lambda x: urgency_order.get(x.urgency, 999), reverse=True)
-            total = len(letters)
-        elif sort_by == "received_date":
-            if sort_order == "asc":
-                query = query.order_by(Letter.received_date.asc())
-            else:
-                query = query.order_by(Letter.received_date.desc())
-            letters = query.all()
-            total = len(letters)
-        elif sort_by == "deadline":
-            if sort_order == "asc":
-                query = query.order_by(Letter.reply_deadline.asc())
-            else:
-                query = query.order_by(Letter.reply_deadline.desc())
-            letters = query.all()
-            total = len(letters)
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Неверное поле для сортировки. Используйте: urgency, received_date, deadline"
-            )
+        letters, total = _letters_page(
+            db.query(Letter), status, urgency, sort_by, sort_order,
+            skip, limit, after_received_date, after_id
+        )
         
-        # Преобразуем письма в ответы с обработкой enum
-        items = []
-        for letter in letters:
-            try:
-                # Убеждаемся, что enum значения правильно преобразованы
-                letter_dict = {
-                    "id": letter.id,
-                    "received_date": letter.received_date,
-                    "sender_name": letter.sender_name,
-                    "sender_email": letter.sender_email,
-                    "original_text": letter.original_text,
-                    "letter_style": LetterStyle(letter.letter_style) if isinstance(letter.letter_style, str) else letter.letter_style,
-                    "reply_deadline": letter.reply_deadline,
-                    "urgency": LetterUrgency(letter.urgency) if isinstance(letter.urgency, str) else letter.urgency,
-                    "status": LetterStatus(letter.status) if isinstance(letter.status, str) else letter.status,
-                    "generated_answer": letter.generated_answer,
-                    "edited_answer": letter.edited_answer,
-                    "sent_date": letter.sent_date,
-                    "created_at": letter.created_at,
-                    "updated_at": letter.updated_at
-                }
-                item = LetterDetailResponse(**letter_dict)
-                items.append(item)
-            except Exception as e:
-                # Если не удалось преобразовать, пробуем напрямую
-                try:
-                    item = LetterDetailResponse.model_validate(letter)
-                    items.append(item)
-                except:
-                    # Пропускаем проблемное письмо
-                    continue
+        items = [LetterDetailResponse.from_orm_fast(letter) for letter in letters]
         
         return LetterListResponse(
             items=items,
-            total=total
+            total=total,
+            next_cursor=_next_cursor(letters, limit) if sort_by == SortBy.RECEIVED_DATE else None
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при получении списка писем: {str(e)}")
+
+
+@protected_router.get("/letters/summary", response_model=LetterSummaryListResponse)
+async def get_letters_summary(
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    urgency: Optional[str] = Query(None, description="Фильтр по срочности"),
+    sort_by: SortBy = Query(SortBy.URGENCY, description="Сортировка: urgency, received_date, deadline"),
+    sort_order: SortOrder = Query(SortOrder.DESC, description="Порядок сортировки: asc, desc"),
+    skip: int = Query(0, ge=0, description="Сколько писем пропустить"),
+    limit: Optional[int] = Query(None, ge=1, description="Максимальное количество писем (по умолчанию все)"),
+    after_received_date: Optional[dt] = Query(None, description="Курсор: received_date последнего письма предыдущей страницы"),
+    after_id: Optional[int] = Query(None, description="Курсор: id последнего письма предыдущей страницы"),
+    db: Session = Depends(get_db)
+):
+    """
+    Краткий список писем для таблицы: только поля, нужные для отображения строки.
+    Из БД выбираются только эти колонки, без текста письма и ответов.
+    Параметры фильтрации, сортировки и пагинации такие же, как у /letters.
+    Требует авторизации админа.
+    """
+    try:
+        rows, total = _letters_page(
+            db.query(
+                Letter.id,
+                Letter.sender_name,
+                Letter.status,
+                Letter.urgency,
+                Letter.received_date,
+                Letter.reply_deadline
+            ),
+            status, urgency, sort_by, sort_order,
+            skip, limit, after_received_date, after_id
+        )
+        
+        return LetterSummaryListResponse(
+            items=_SUMMARY_LIST_ADAPTER.validate_python(rows, from_attributes=True),
+            total=total,
+            next_cursor=_next_cursor(rows, limit) if sort_by == SortBy.RECEIVED_DATE else None
         )
         
     except HTTPException:
@@ -164,67 +268,37 @@ async def get_all_letters(
         raise HTTPException(status_code=500, detail=f"Ошибка при получении списка писем: {str(e)}")
 
 
-@router.get("/letters/{letter_id}", response_model=LetterDetailResponse)
+@protected_router.get("/letters/{letter_id}", response_model=LetterDetailResponse)
 async def get_letter(
     letter_id: int,
-    db: Session = Depends(get_db),
-    current_admin: bool = Depends(get_current_admin)
+    db: Session = Depends(get_db)
 ):
     """
     Получает детальную информацию о письме по ID.
     Требует авторизации админа.
     """
-    letter = db.query(Letter).filter(Letter.id == letter_id).first()
-    
-    if not letter:
-        raise HTTPException(status_code=404, detail="Письмо не найдено")
-    
-    # Преобразуем enum значения если они строки
-    try:
-        letter_dict = {
-            "id": letter.id,
-            "received_date": letter.received_date,
-            "sender_name": letter.sender_name,
-            "sender_email": letter.sender_email,
-            "original_text": letter.original_text,
-            "letter_style": LetterStyle(letter.letter_style) if isinstance(letter.letter_style, str) else letter.letter_style,
-            "reply_deadline": letter.reply_deadline,
-            "urgency": LetterUrgency(letter.urgency) if isinstance(letter.urgency, str) else letter.urgency,
-            "status": LetterStatus(letter.status) if isinstance(letter.status, str) else letter.status,
-            "generated_answer": letter.generated_answer,
-            "edited_answer": letter.edited_answer,
-            "sent_date": letter.sent_date,
-            "created_at": letter.created_at,
-            "updated_at": letter.updated_at
-        }
-        return LetterDetailResponse(**letter_dict)
-    except:
-        return LetterDetailResponse.model_validate(letter)
-
-
-@router.put("/letters/{letter_id}/edit", response_model=LetterDetailResponse)
+    letter = _get_letter_or_404(db, letter_id)
+    return LetterDetailResponse.from_orm_fast(letter)
+
+
+@protected_router.put("/letters/{letter_id}/edit", response_model=LetterDetailResponse)
 async def edit_letter_answer(
     letter_id: int,
     edit_request: LetterEditRequest,
-    db: Session = Depends(get_db),
-    current_admin: bool = Depends(get_current_admin)
+    db: Session = Depends(get_db)
 ):
     """
     Редактирует ответ письма. Сохраняет отредактированный ответ.
     Требует авторизации админа.
     """
     try:
-        letter = db.query(Letter).filter(Letter.id == letter_id).first()
-        
-        if not letter:
-            raise HTTPException(status_code=404, detail="Письмо не найдено")
+        letter = _get_letter_or_404(db, letter_id)
         
         letter.edited_answer = edit_request.edited_answer
         
         db.commit()
-        db.refresh(letter)
         
-        return LetterDetailResponse.model_validate(letter)
+        return LetterDetailResponse.from_orm_fast(letter)
         
     except HTTPException:
         raise
@@ -233,12 +307,11 @@ async def edit_letter_answer(
         raise HTTPException(status_code=500, detail=f"Ошибка при редактировании ответа: {str(e)}")
 
 
-@router.post("/letters/{letter_id}/approve", response_model=LetterDetailResponse)
+@protected_router.post("/letters/{letter_id}/approve", response_model=LetterDetailResponse)
 async def approve_letter(
     letter_id: int,
     approval_request: LetterApprovalRequest,
-    db: Session = Depends(get_db),
-    current_admin: bool = Depends(get_current_admin)
+    db: Session = Depends(get_db)
 ):
     """
     Одобряет письмо.
@@ -246,10 +319,7 @@ async def approve_letter(
     Требует авторизации админа.
     """
     try:
-        letter = db.query(Letter).filter(Letter.id == letter_id).first()
-        
-        if not letter:
-            raise HTTPException(status_code=404, detail="Письмо не найдено")
+        letter = _get_letter_or_404(db, letter_id)
         
         if approval_request.approved:
             letter.status = LetterStatus.APPROVED
@@ -257,9 +327,8 @@ async def approve_letter(
                 letter.edited_answer = approval_request.edited_answer
         
         db.commit()
-        db.refresh(letter)
         
-        return LetterDetailResponse.model_validate(letter)
+        return LetterDetailResponse.from_orm_fast(letter)
         
     except HTTPException:
         raise
@@ -268,11 +337,11 @@ async def approve_letter(
         raise HTTPException(status_code=500, detail=f"Ошибка при одобрении письма: {str(e)}")
 
 
-@router.post("/letters/{letter_id}/send", response_model=LetterDetailResponse)
+@protected_router.post("/letters/{letter_id}/send", response_model=LetterDetailResponse)
 async def send_letter(
     letter_id: int,
     db: Session = Depends(get_db),
-    current_admin: bool = Depends(get_current_admin)
+    email_sender: EmailSender = Depends(get_email_sender)
 ):
     """
     Отправляет одобренное письмо адресанту.
@@ -281,10 +350,7 @@ async def send_letter(
     Требует авторизации админа.
     """
     try:
-        letter = db.query(Letter).filter(Letter.id == letter_id).first()
-        
-        if not letter:
-            raise HTTPException(status_code=404, detail="Письмо не найдено")
+        letter = _get_letter_or_404(db, letter_id)
         
         if letter.status != LetterStatus.APPROVED:
             raise HTTPException(
@@ -300,7 +366,6 @@ async def send_letter(
         
         answer_to_send = letter.edited_answer or letter.generated_answer
         
-        email_sender = EmailSender()
         await email_sender.send_email(
             to_email=letter.sender_email,
             to_name=letter.sender_name,
@@ -312,9 +377,8 @@ async def send_letter(
         letter.sent_date = dt.now(timezone.utc)
         
         db.commit()
-        db.refresh(letter)
         
-        return LetterDetailResponse.model_validate(letter)
+        return LetterDetailResponse.from_orm_fast(letter)
         
     except HTTPException:
         raise
@@ -323,53 +387,47 @@ async def send_letter(
         raise HTTPException(status_code=500, detail=f"Ошибка при отправке письма: {str(e)}")
 
 
-@router.get("/history", response_model=HistoryResponse)
+@protected_router.get("/history", response_model=HistoryResponse)
 async def get_history(
-    db: Session = Depends(get_db),
-    current_admin: bool = Depends(get_current_admin)
+    skip: int = Query(0, ge=0, description="Сколько писем пропустить"),
+    limit: Optional[int] = Query(None, ge=1, description="Максимальное количество писем (по умолчанию все)"),
+    after_received_date: Optional[dt] = Query(None, description="Курсор: received_date последнего письма предыдущей страницы"),
+    after_id: Optional[int] = Query(None, description="Курсор: id последнего письма предыдущей страницы"),
+    db: Session = Depends(get_db)
 ):
     """
     Возвращает историю всех писем и ответов из базы данных.
-    Возвращает все письма без ограничений.
+    Без limit возвращает все письма.
+    Для глубоких страниц вместо skip передавайте курсор из next_cursor.
     Требует авторизации админа.
     """
     try:
+        use_cursor = _use_cursor(after_received_date, after_id)
+        
         query = db.query(Letter)
-        letters = query.order_by(Letter.received_date.desc()).all()
-        total = len(letters)
+        total = _count(query)
+        query = query.order_by(Letter.received_date.desc(), Letter.id.desc())
+        if use_cursor:
+            query = _after_cursor(query, after_received_date, after_id)
+        else:
+            query = query.offset(skip)
+        letters = query.limit(limit).all()
         
-        # Преобразуем письма в ответы с обработкой enum
-        items = []
-        for letter in letters:
-            try:
-                letter_dict = {
-                    "id": letter.id,
-                    "received_date": letter.received_date,
-                    "sender_name": letter.sender_name,
-                    "sender_email": letter.sender_email,
-                    "original_text": letter.original_text,
-                    "generated_answer": letter.generated_answer,
-                    "status": LetterStatus(letter.status) if isinstance(letter.status, str) else letter.status,
-                    "created_at": letter.created_at,
-                    "updated_at": letter.updated_at
-                }
-                item = HistoryItem(**letter_dict)
-                items.append(item)
-            except:
-                try:
-                    item = HistoryItem.model_validate(letter)
-                    items.append(item)
-                except:
-                    continue
+        items = _HISTORY_LIST_ADAPTER.validate_python(letters, from_attributes=True)
         
         return HistoryResponse(
             items=items,
-            total=total
+            total=total,
+            next_cursor=_next_cursor(letters, limit)
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Ошибка при получении истории: {str(e)}"
         )
 
+
+router.include_router(protected_router)
@@ -0,0 +1,69 @@
+"""
+ASGI-middleware проверки JWT токена админа.
+
+Проверка выполняется до маршрутизации FastAPI: невалидный запрос получает 401
+без построения Request и разрешения зависимостей.
+"""
+
+from typing import Iterable
+
+import orjson
+from jose import JWTError
+
+from services.auth import decode_token
+
+_UNAUTHORIZED_BODY = orjson.dumps({"detail": "Не удалось проверить учетные данные"})
+_UNAUTHORIZED_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_UNAUTHORIZED_BODY)).encode("latin-1")),
+    (b"www-authenticate", b"Bearer"),
+]
+
+
+class AdminAuthMiddleware:
+    """Пропускает к префиксу prefix только запросы с валидным токеном админа"""
+
+    def __init__(self, app, prefix: str, public_paths: Iterable[str] = ()):
+        """
+        Args:
+            app: ASGI-приложение
+            prefix: Префикс защищаемых путей (например, /api/v1/admin)
+            public_paths: Пути под префиксом, доступные без токена
+        """
+        self.app = app
+        self.prefix = prefix
+        self._public = frozenset(public_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":  # CORS preflight идет без токена
+            await self.app(scope, receive, send)
+            return
+
+        # За прокси с root_path путь приходит вместе с ним: сравниваем путь внутри приложения
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        if not path.startswith(self.prefix) or path in self._public:
+            await self.app(scope, receive, send)
+            return
+
+        if self._is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        await send({"type": "http.response.start", "status": 401, "headers": _UNAUTHORIZED_HEADERS})
+        await send({"type": "http.response.body", "body": _UNAUTHORIZED_BODY})
+
+    @staticmethod
+    def _is_admin(scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return False
+                try:
+                    return bool(decode_token(token.strip()).get("admin", False))
+                except JWTError:
+                    return False
+        return False
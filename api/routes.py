@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional
@@ -6,10 +8,10 @@ from datetime import datetime as dt
 from db.session import get_db
 from schemas.letter import LetterRequest, LetterProcessResponse
 from schemas.history import GenerateRequest, GenerateResponse
-from services.letter_processor import LetterProcessor
-from services.ml_classifier import get_ml_classifier
+from services.letter_processor import get_letter_processor
+from services.ml_batcher import get_ml_batcher
 from services.generate_answer import generate_answer
-from services.field_extractor import FieldExtractor
+from services.field_extractor import get_field_extractor
 from domain.letters import LetterType, to_letter_type, get_reply_deadline_days, get_letter_style
 from models.letter import Letter, LetterStatus, LetterUrgency, to_letter_urgency
 
@@ -36,8 +38,8 @@ async def process_letter(
     - Статус: pending_approval
     """
     try:
-        processor = LetterProcessor()
-        processed_data = processor.process_letter(
+        processor = get_letter_processor()
+        processed_data = await processor.process_letter(
             text=letter_request.text,
             sender_name=letter_request.sender_name
         )
@@ -63,7 +65,6 @@ async def process_letter(
         
         db.add(letter)
         db.commit()
-        db.refresh(letter)
         
         return LetterProcessResponse(
             letter_id=letter.id,
@@ -94,26 +95,23 @@ async def generate(
     Сохраняет в историю.
     """
     try:
-        ml_classifier = get_ml_classifier()
-        classification_result = ml_classifier.classify(request.text)
+        field_extractor = get_field_extractor()
+        
+        # Классификация (пачками через батчер) и извлечение полей независимы: выполняем параллельно.
+        # Сущности ML (даты, договоры) извлекаются один раз — в extract_all вместе с полями
+        classification_result, fields = await asyncio.gather(
+            get_ml_batcher().submit(request.text),
+            asyncio.to_thread(field_extractor.extract_all, request.text)
+        )
         classification = classification_result["type"]
         letter_type: LetterType = to_letter_type(classification)
         confidence = classification_result.get("confidence", 0.7)
         
-        field_extractor = FieldExtractor()
-        fields = field_extractor.extract_all(request.text)
-        
-        if classification_result.get("entities"):
-            entities = classification_result["entities"]
-            if entities.get("dates"):
-                fields["dates"] = list(set(fields.get("dates", []) + entities["dates"]))
-            if entities.get("contract_numbers"):
-                fields["contract_numbers"] = list(set(fields.get("contract_numbers", []) + entities["contract_numbers"]))
-        
-        generated_answer = generate_answer(
+        generated_answer = await generate_answer(
             text=request.text,
             classification=classification,
-            fields=fields
+            fields=fields,
+            confidence=confidence
         )
         
         reply_deadline_days = get_reply_deadline_days(letter_type)
@@ -138,7 +136,6 @@ async def generate(
         
         db.add(letter)
         db.commit()
-        db.refresh(letter)
         
         return GenerateResponse(
             id=letter.id,
@@ -1,4 +1,4 @@
-from .config import settings
+from .config import settings, get_settings
 
-__all__ = ["settings"]
+__all__ = ["settings", "get_settings"]
 
@@ -1,3 +1,6 @@
+import os
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from typing import Optional
@@ -6,6 +9,8 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database settings
     DATABASE_URL: str = "sqlite:///./letters.db"
+    # Создавать таблицы при старте (для разработки); иначе: python -m scripts.init_db
+    AUTO_CREATE_TABLES: bool = False
     
     # Yandex Cloud LLM settings
     YANDEX_API_KEY: Optional[str] = None
@@ -32,6 +37,24 @@ class Settings(BaseSettings):
     # Application settings
     APP_NAME: str = "PSB AI Backend"
     DEBUG: bool = False
+    # Число воркеров uvicorn; по умолчанию — по числу ядер (при DEBUG всегда один)
+    WORKERS: Optional[int] = None
+    # Процессов предобработки на воркер; по умолчанию ядра делятся между воркерами
+    PREPROCESS_WORKERS: Optional[int] = None
+
+    @property
+    def worker_count(self) -> int:
+        """Сколько воркеров uvicorn запускает main.py"""
+        if self.DEBUG:
+            return 1
+        return max(1, self.WORKERS or os.cpu_count() or 1)
+
+    @property
+    def preprocess_worker_count(self) -> int:
+        """Размер пула предобработки в одном воркере: всего не больше процессов, чем ядер"""
+        if self.PREPROCESS_WORKERS:
+            return max(1, self.PREPROCESS_WORKERS)
+        return max(1, (os.cpu_count() or 1) // self.worker_count)
     
     class Config:
         env_file = ".env"
@@ -39,7 +62,13 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """Возвращает настройки приложения (.env читается один раз за процесс)"""
+    return Settings()
+
+
+settings = get_settings()
 
 # Проверка что пароль загружен из .env
 if not settings.ADMIN_PASSWORD or settings.ADMIN_PASSWORD == "":
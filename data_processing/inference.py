@@ -1,13 +1,47 @@
 # inference.py
+import hashlib
 import joblib
+import mmap
 import sys
 import os
+from collections import OrderedDict
+from joblib import Parallel, delayed
 from preprocessing import enhanced_preprocess_text, extract_entities
 
 # Папка с моделями
 MODELS_DIR = 'models'
+BUNDLE_FILE = 'bundle.pkl'
 INPUT_FILE = 'input.txt'
 OUTPUT_FILE = 'output.txt'
+# Для классификации достаточно начала письма; остаток файла не читается
+MAX_BYTES = 64 * 1024
+# Размер LRU-кэша результатов classify_email
+CACHE_SIZE = 4096
+# Пакеты от PARALLEL_MIN_BATCH писем предобрабатываются в процессах; мелкие — на месте,
+# запуск воркеров дороже самой предобработки
+PARALLEL_MIN_BATCH = 256
+
+class LoadedModels(dict):
+    """Модели по задачам; хранит кэш результатов classify_email для этого набора моделей."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Хэш текста -> результат; порядок ключей — порядок использования
+        self.result_cache = OrderedDict()
+
+def _parse_tuple(value):
+    """Разбирает кортеж вида '(1, 2)'."""
+    return tuple(map(int, value.strip('()').split(', ')))
+
+# Преобразование типов по имени гиперпараметра; неизвестные ключи остаются строками
+_PARSERS = {
+    'max_features': int,
+    'ngram_range': _parse_tuple,
+    'min_df': int,
+    'max_df': float,
+    'C': float,
+    'max_iter': int,
+}
 
 def load_hyperparameters(filename='parameters.txt'):
     """Загружает гиперпараметры из файла."""
@@ -15,27 +49,31 @@ def load_hyperparameters(filename='parameters.txt'):
     with open(filename, 'r', encoding='utf-8') as f:
         for line in f:
             key, value = line.strip().split(': ')
-            # Преобразуем типы данных
-            if key == 'max_features':
-                value = int(value)
-            elif key == 'ngram_range':
-                value = tuple(map(int, value.strip('()').split(', ')))
-            elif key == 'min_df':
-                value = int(value)
-            elif key == 'max_df':
-                value = float(value)
-            elif key == 'C':
-                value = float(value)
-            elif key == 'max_iter':
-                value = int(value)
-            hyperparams[key] = value
+            hyperparams[key] = _PARSERS.get(key, str)(value)
     return hyperparams
 
 def load_models():
     """Загружает обученные модели из папки models."""
     tasks = ['type', 'urgency', 'tone']
-    models = {}
+    models = LoadedModels()
+    
+    # Новый формат: один файл, массивы моделей отображаются в память через mmap
+    bundle_path = os.path.join(MODELS_DIR, BUNDLE_FILE)
+    if os.path.exists(bundle_path):
+        bundle = joblib.load(bundle_path, mmap_mode='r')
+        vectorizer = bundle['vectorizer']
+        for task_name in tasks:
+            classifier = bundle['classifiers'].get(task_name)
+            if classifier is None:
+                print(f"Модель для {task_name} не найдена в {bundle_path}!")
+                return None
+            models[task_name] = {
+                'vectorizer': vectorizer,
+                'classifier': classifier
+            }
+        return models
     
+    # Старый формат: отдельные векторизатор и классификатор на задачу
     for task_name in tasks:
         try:
             vectorizer_path = os.path.join(MODELS_DIR, f'vectorizer_{task_name}.pkl')
@@ -55,20 +93,44 @@ def load_models():
     return models
 
 def classify_email(text, models):
+    """
+    Классифицирует письмо и извлекает сущности.
+
+    Для моделей из load_models повторные тексты берутся из кэша этого набора моделей.
+    Возвращается копия результата (словарь и списки сущностей), кэш она не затрагивает.
+    """
+    cache = getattr(models, 'result_cache', None)
+    if cache is None:
+        return _classify_email(text, models)
+    
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    result = cache.get(key)
+    if result is not None:
+        cache.move_to_end(key)
+    else:
+        result = cache[key] = _classify_email(text, models)
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    return {**result, 'entities': {name: list(values) for name, values in result['entities'].items()}}
+
+def _classify_email(text, models):
     """Классифицирует письмо и извлекает сущности."""
     # Извлекаем сущности
     entities = extract_entities(text)
     
+    # Предобработка текста (одинакова для всех задач)
+    processed_text = enhanced_preprocess_text(text, remove_personal_data_flag=True)
+    
     # Классифицируем по задачам
     classification = {}
+    vectors = {}
     
     for task_name, model_data in models.items():
-        # Предобработка текста
-        processed_text = enhanced_preprocess_text(text, remove_personal_data_flag=True)
-        
-        # Векторизация
+        # Векторизация: один раз на векторизатор (при общем векторизаторе — один раз на письмо)
         vectorizer = model_data['vectorizer']
-        text_vector = vectorizer.transform([processed_text])
+        text_vector = vectors.get(id(vectorizer))
+        if text_vector is None:
+            text_vector = vectors[id(vectorizer)] = vectorizer.transform([processed_text])
         
         # Классификация
         classifier = model_data['classifier']
@@ -83,6 +145,40 @@ def classify_email(text, models):
         'entities': entities
     }
 
+def classify_emails(texts, models, n_jobs=-1, batch_size=64):
+    """Классифицирует список писем пакетно: одна векторизация и одно предсказание на задачу."""
+    # Большой список предобрабатывается параллельно по процессам, небольшой — на месте
+    if len(texts) >= PARALLEL_MIN_BATCH and n_jobs != 1:
+        processed_texts = Parallel(n_jobs=n_jobs, prefer="processes", batch_size=batch_size)(
+            delayed(enhanced_preprocess_text)(text, remove_personal_data_flag=True)
+            for text in texts
+        )
+    else:
+        processed_texts = [
+            enhanced_preprocess_text(text, remove_personal_data_flag=True)
+            for text in texts
+        ]
+    
+    # Векторизация пакетом: один раз на векторизатор
+    matrices = {}
+    predictions = {}
+    for task_name, model_data in models.items():
+        vectorizer = model_data['vectorizer']
+        X = matrices.get(id(vectorizer))
+        if X is None:
+            X = matrices[id(vectorizer)] = vectorizer.transform(processed_texts)
+        predictions[task_name] = model_data['classifier'].predict(X)
+    
+    return [
+        {
+            'type': predictions['type'][i],
+            'urgency': predictions['urgency'][i],
+            'tone': predictions['tone'][i],
+            'entities': extract_entities(text)
+        }
+        for i, text in enumerate(texts)
+    ]
+
 def save_to_file(result, filename=OUTPUT_FILE):
     """Сохраняет результат в файл в требуемом формате."""
     with open(filename, 'w', encoding='utf-8') as f:
@@ -91,11 +187,15 @@ def save_to_file(result, filename=OUTPUT_FILE):
         f.write(f"{result['tone']}\n")
         f.write(f"{result['entities']}\n")
 
-def read_input_text(filename=INPUT_FILE):
-    """Читает текст письма из файла."""
+def read_input_text(filename=INPUT_FILE, max_bytes=MAX_BYTES):
+    """Читает текст письма из файла (не более max_bytes байт)."""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            text = f.read().strip()
+        with open(filename, 'rb') as f:
+            # mmap нельзя создать для пустого файла
+            if os.fstat(f.fileno()).st_size == 0:
+                return ''
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = mm[:max_bytes].decode('utf-8', errors='replace').strip()
         return text
     except FileNotFoundError:
         print(f"Файл {filename} не найден!")
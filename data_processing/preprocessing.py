@@ -1,7 +1,11 @@
 # preprocessing.py
 import re
 import string
-from typing import List, Dict, Any
+import sys
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain
+from typing import List, Dict, Any, Tuple
 
 try:
     import pymorphy3
@@ -11,26 +15,96 @@ except ImportError:
     USE_LEMMATIZATION = False
 
 # Русские стоп-слова
-RUSSIAN_STOP_WORDS = {
+RUSSIAN_STOP_WORDS = frozenset(map(sys.intern, {
     'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все',
     'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по',
     'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из',
     'ему', 'теперь', 'когда', 'даже', 'ну', 'вдруг', 'ли', 'если', 'уже', 'или',
     'ни', 'быть', 'был', 'него', 'до', 'вас', 'нибудь', 'опять', 'уж', 'вам', 'ведь',
     'там', 'потом', 'себя', 'ничего', 'ей', 'может', 'они', 'тут', 'где', 'есть'
-}
+}))
+# Токены длиннее самого длинного стоп-слова не проверяются по множеству
+_MAX_STOP_WORD_LEN = max(map(len, RUSSIAN_STOP_WORDS))
+
+class _TranslateTable(dict):
+    """Таблица для str.translate, заполняемая лениво по классам символов Unicode.
+
+    Классы совпадают с \\w, \\s и \\d модуля re: цифры удаляются, прочие символы,
+    кроме букв, цифр, '_' и пробельных, заменяются пробелом.
+    """
+
+    def __init__(self, punctuation: bool, numbers: bool):
+        super().__init__()
+        self.punctuation = punctuation
+        self.numbers = numbers
+
+    def __missing__(self, code: int):
+        char = chr(code)
+        if self.numbers and char.isdecimal():
+            value = None
+        elif self.punctuation and not (char.isalnum() or char == '_' or char.isspace()):
+            value = ' '
+        else:
+            value = code
+        self[code] = value
+        return value
+
+_PUNCT_TABLE = _TranslateTable(punctuation=True, numbers=False)
+_NUM_TABLE = _TranslateTable(punctuation=False, numbers=True)
+_STRIP_TABLE = _TranslateTable(punctuation=True, numbers=True)
+
+# Паттерны сущностей: (вид, паттерн, без учета регистра).
+# Порядок внутри вида важен: результаты выдаются в порядке паттернов, как при последовательном поиске
+_ENTITY_PATTERNS = (
+    # ФИО
+    # Окончания фамилий и отчеств (ов, ев, ...; ич, вна, ...) уже поглощаются жадным [а-яё]{2,},
+    # поэтому отдельные необязательные группы для них не нужны: они лишь множили варианты
+    # перебора с возвратом, когда за словом не следует пробел
+    ('full_name', r'\b[А-ЯЁ][а-яё]{2,}\s+[А-ЯЁ][а-яё]{2,}\s+[А-ЯЁ][а-яё]{2,}', False),
+    ('initials', r'\b[А-ЯЁ][а-яё]{2,}\s+[А-ЯЁ]\.\s*[А-ЯЁ]\.', False),
+    # Даты
+    ('date', r'\d{1,2}-\d{1,2}\s+[а-яё]+\s+\d{4}\s+года?', True),
+    ('date', r'\d{1,2}\s+[а-яё]+\s+\d{4}\s+года?', True),
+    ('date', r'\d{1,2}\.\d{1,2}\.\d{4}', True),
+    ('date', r'\d{4}-\d{1,2}-\d{1,2}', True),
+    # Номера договоров
+    ('contract', r'№+[А-ЯЁ]{1,3}-?\d{1,6}', True),
+    ('contract', r'договор[ауе]?\s+№+[А-ЯЁ]{0,3}-?\d{1,6}', True),
+    # Номера счетов
+    ('account', r'счет[ауе]?\s+№?\s*\d{5,}', True),
+    ('account', r'№\s*\d{16,}', True),
+    ('account', r'\b\d{16,}\b', True),
+)
+_ENTITY_KINDS = tuple(kind for kind, _, _ in _ENTITY_PATTERNS)
+
+# Имена и даты ищутся одной альтернацией: текст сканируется один раз, вид — по имени группы.
+# Альтернация не находит пересекающихся совпадений, поэтому в нее входят только паттерны,
+# чьи пересечения и так отбрасываются (даты — проверкой на вложенность). Опережающая
+# проверка первого символа (цифра или заглавная буква) отсекает лишние позиции
+_FUSED_KINDS = ('full_name', 'initials', 'date')
+_ENTITY_RE = re.compile(r'(?=[\dА-ЯЁ])(?:' + '|'.join(
+    f'(?P<g{i}>(?i:{pattern}))' if ignore_case else f'(?P<g{i}>{pattern})'
+    for i, (kind, pattern, ignore_case) in enumerate(_ENTITY_PATTERNS)
+    if kind in _FUSED_KINDS
+) + ')')
+# Номера договоров и счетов пересекаются друг с другом («№АБ-1234567890123456» — и договор,
+# и счет), поэтому каждый такой паттерн сканируется отдельно, в порядке таблицы
+_SEPARATE_ENTITY_RES = tuple(
+    (kind, re.compile(pattern, re.IGNORECASE if ignore_case else 0))
+    for kind, pattern, ignore_case in _ENTITY_PATTERNS
+    if kind not in _FUSED_KINDS
+)
+_NAME_EXCLUDE_WORDS = ('уважаемый', 'просим', 'требуем', 'сообщаем', 'информируем', 'подтверждаем')
+_CONTRACT_PREFIX_RE = re.compile(r'договор[ауе]?\s+', re.IGNORECASE)
+_ACCOUNT_DIGITS_RE = re.compile(r'\d{5,}')
 
 def remove_punctuation(text: str) -> str:
     """Удаляет пунктуацию из текста."""
-    text = re.sub(r'[^\w\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    return ' '.join(text.translate(_PUNCT_TABLE).split())
 
 def remove_numbers(text: str) -> str:
     """Удаляет числа из текста."""
-    text = re.sub(r'\d+', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    return ' '.join(text.translate(_NUM_TABLE).split())
 
 def tokenize(text: str) -> List[str]:
     """Разбивает текст на токены (слова)."""
@@ -43,104 +117,110 @@ def remove_stop_words(tokens: List[str], stop_words: set = None) -> List[str]:
         stop_words = RUSSIAN_STOP_WORDS
     return [token for token in tokens if token not in stop_words]
 
+@lru_cache(maxsize=200_000)
+def _lemma(token: str) -> str:
+    """Нормальная форма токена; кэш общий для всех документов процесса."""
+    return morph.parse(token)[0].normal_form
+
 def lemmatize_tokens(tokens: List[str]) -> List[str]:
     """Выполняет лемматизацию токенов."""
     if not USE_LEMMATIZATION:
         return tokens
     
-    lemmatized = []
-    for token in tokens:
-        parsed = morph.parse(token)[0]
-        lemmatized.append(parsed.normal_form)
-    return lemmatized
+    return [_lemma(token) for token in tokens]
 
-def extract_entities(text: str) -> Dict[str, List[str]]:
-    """Извлекает персональные данные и другие сущности из текста."""
+# Метки, которыми заменяются персональные данные
+_NAME_TAG = '[ФИО]'
+_DATE_TAG = '[ДАТА]'
+_CONTRACT_TAG = '[НОМЕР_ДОГОВОРА]'
+_ACCOUNT_TAG = '[НОМЕР_СЧЕТА]'
+
+def _scan_entities(text: str) -> Tuple[Dict[str, List[str]], List[Tuple[int, int, str]]]:
+    """Находит сущности за один проход: возвращает сущности и позиции (start, end, метка) для замены."""
     result = {
         'names': [],
         'dates': [],
         'contract_numbers': [],
         'account_numbers': []
     }
+    # Отсортированные непересекающиеся (start, end, метка)
+    spans = []
+
+    def add_span(start: int, end: int, tag: str) -> None:
+        # Сущности перебираются в порядке замены (ФИО, даты, договоры, счета): часть текста,
+        # уже занятая более ранней меткой, повторно не заменяется
+        i = bisect_left(spans, (start,))
+        if (i and spans[i - 1][1] > start) or (i < len(spans) and spans[i][0] < end):
+            return
+        spans.insert(i, (start, end, tag))
+
+    # Сортировка по (паттерн, позиция) сохраняет порядок последовательного поиска
+    fused = sorted(
+        (int(m.lastgroup[1:]), m.start(), m.group())
+        for m in _ENTITY_RE.finditer(text)
+    )
+    matches = chain(
+        ((_ENTITY_KINDS[index], start, match) for index, start, match in fused),
+        ((kind, m.start(), m.group()) for kind, rx in _SEPARATE_ENTITY_RES for m in rx.finditer(text)),
+    )
 
-    # Паттерны для ФИО
-    full_name_pattern = r'\b[А-ЯЁ][а-яё]{2,}(?:ов|ев|ин|ын|ая|ья|ий|ой)?\s+[А-ЯЁ][а-яё]{2,}\s+[А-ЯЁ][а-яё]{2,}(?:ич|вна|вич|овна|евич|ельевна)?'
-    full_names = re.findall(full_name_pattern, text)
-    
-    for name in full_names:
-        exclude_words = ['уважаемый', 'просим', 'требуем', 'сообщаем', 'информируем', 'подтверждаем']
-        first_word = name.split()[0].lower()
-        if first_word not in exclude_words and name not in result['names']:
-            result['names'].append(name)
-
-    initials_pattern = r'\b[А-ЯЁ][а-яё]{2,}(?:ов|ев|ин|ын|ая|ья|ий|ой)?\s+[А-ЯЁ]\.\s*[А-ЯЁ]\.'
-    initials_matches = re.findall(initials_pattern, text)
-    for match in initials_matches:
-        if match not in result['names']:
-            result['names'].append(match)
-
-    # Паттерны для дат
-    date_patterns = [
-        r'\d{1,2}-\d{1,2}\s+[а-яё]+\s+\d{4}\s+года?',
-        r'\d{1,2}\s+[а-яё]+\s+\d{4}\s+года?',
-        r'\d{1,2}\.\d{1,2}\.\d{4}',
-        r'\d{4}-\d{1,2}-\d{1,2}',
-    ]
-    
     found_dates = set()
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
+    for kind, start, match in matches:
+        end = start + len(match)
+        if kind == 'full_name':
+            first_word = match.split()[0].lower()
+            if first_word not in _NAME_EXCLUDE_WORDS:
+                add_span(start, end, _NAME_TAG)
+                if match not in result['names']:
+                    result['names'].append(match)
+        elif kind == 'initials':
+            add_span(start, end, _NAME_TAG)
+            if match not in result['names']:
+                result['names'].append(match)
+        elif kind == 'date':
             is_subset = any(match in d or d in match for d in found_dates if match != d)
             if not is_subset:
+                add_span(start, end, _DATE_TAG)
                 found_dates.add(match)
                 result['dates'].append(match)
-
-    # Паттерны для номеров договоров
-    contract_patterns = [
-        r'№+[А-ЯЁ]{1,3}-?\d{1,6}',
-        r'договор[ауе]?\s+№+[А-ЯЁ]{0,3}-?\d{1,6}',
-    ]
-    
-    for pattern in contract_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            clean_match = re.sub(r'договор[ауе]?\s+', '', match, flags=re.IGNORECASE).strip()
+        elif kind == 'contract':
+            clean_match = _CONTRACT_PREFIX_RE.sub('', match).strip()
+            # Заменяется только сам номер, слово «договор» остается в тексте
+            add_span(end - len(clean_match), end, _CONTRACT_TAG)
             if clean_match not in result['contract_numbers']:
                 result['contract_numbers'].append(clean_match)
+        else:
+            for number_match in _ACCOUNT_DIGITS_RE.finditer(match):
+                number = number_match.group()
+                if len(number) >= 16:
+                    add_span(start + number_match.start(), start + number_match.end(), _ACCOUNT_TAG)
+                    if number not in result['account_numbers']:
+                        result['account_numbers'].append(number)
 
-    # Паттерны для номеров счетов
-    account_patterns = [
-        r'счет[ауе]?\s+№?\s*\d{5,}',
-        r'№\s*\d{16,}',
-        r'\b\d{16,}\b',
-    ]
-    
-    for pattern in account_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            numbers = re.findall(r'\d{5,}', match)
-            for number in numbers:
-                if len(number) >= 16 and number not in result['account_numbers']:
-                    result['account_numbers'].append(number)
+    return result, spans
 
-    return result
+def extract_entities(text: str) -> Dict[str, List[str]]:
+    """Извлекает персональные данные и другие сущности из текста."""
+    return _scan_entities(text)[0]
+
+def remove_personal_data_with_entities(text: str) -> Tuple[str, Dict[str, List[str]]]:
+    """Заменяет персональные данные на метки и возвращает найденные сущности (один проход по тексту)."""
+    entities, spans = _scan_entities(text)
+    if not spans:
+        return text, entities
+
+    parts = []
+    position = 0
+    for start, end, tag in spans:
+        parts.append(text[position:start])
+        parts.append(tag)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts), entities
 
 def remove_personal_data(text: str) -> str:
     """Удаляет персональные данные из текста, заменяя их на метки."""
-    processed_text = text
-    entities = extract_entities(text)
-    
-    for name in entities['names']:
-        processed_text = processed_text.replace(name, '[ФИО]')
-    for date in entities['dates']:
-        processed_text = processed_text.replace(date, '[ДАТА]')
-    for contract in entities['contract_numbers']:
-        processed_text = processed_text.replace(contract, '[НОМЕР_ДОГОВОРА]')
-    for account in entities['account_numbers']:
-        processed_text = processed_text.replace(account, '[НОМЕР_СЧЕТА]')
-    
-    return processed_text
+    return remove_personal_data_with_entities(text)[0]
 
 def enhanced_preprocess_text(text: str,
                            remove_personal_data_flag: bool = True,
@@ -158,18 +238,27 @@ def enhanced_preprocess_text(text: str,
 
     text = text.lower()
 
+    # Пунктуация заменяется пробелом, цифры удаляются одним вызовом translate;
+    # цифры стоят внутри токенов, поэтому их удаление не склеивает соседние токены
     if remove_punctuation_flag:
-        text = remove_punctuation(text)
-
-    if remove_numbers_flag:
-        text = remove_numbers(text)
-
-    tokens = tokenize(text)
+        text = text.translate(_STRIP_TABLE if remove_numbers_flag else _PUNCT_TABLE)
+    elif remove_numbers_flag:
+        text = text.translate(_NUM_TABLE)
+    raw_tokens = text.split()
 
+    stop_words = None
     if remove_stop_words_flag:
-        tokens = remove_stop_words(tokens, custom_stop_words)
+        if custom_stop_words is None:
+            stop_words, max_stop_len = RUSSIAN_STOP_WORDS, _MAX_STOP_WORD_LEN
+        else:
+            stop_words, max_stop_len = custom_stop_words, max(map(len, custom_stop_words), default=0)
+    lemmatize = lemmatize_flag and USE_LEMMATIZATION
 
-    if lemmatize_flag and USE_LEMMATIZATION:
-        tokens = lemmatize_tokens(tokens)
+    # Удаление стоп-слов и лемматизация за один проход по токенам
+    tokens = []
+    for token in raw_tokens:
+        if stop_words is not None and len(token) <= max_stop_len and token in stop_words:
+            continue
+        tokens.append(_lemma(token) if lemmatize else token)
 
     return ' '.join(tokens)
\ No newline at end of file
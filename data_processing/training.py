@@ -1,7 +1,9 @@
 # training.py
+import numpy as np
 import pandas as pd
 import joblib
 import os
+from joblib import Parallel, delayed
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
@@ -12,6 +14,8 @@ from preprocessing import enhanced_preprocess_text
 
 # Создаем папку для моделей
 MODELS_DIR = 'models'
+# Единый файл с векторизатором и классификаторами всех задач (загружается через mmap)
+BUNDLE_FILE = 'bundle.pkl'
 os.makedirs(MODELS_DIR, exist_ok=True)
 
 def load_data(csv_path: str = 'data.csv'):
@@ -36,24 +40,35 @@ def split_data(X, y, test_size=0.15, val_size=0.15, random_state=42):
     
     return X_train, X_val, X_test, y_train, y_val, y_test
 
-def train_task_model(texts, labels, task_name, hyperparams):
-    """Обучает модель для конкретной задачи."""
-    # Разделение данных
-    X_train, X_val, X_test, y_train, y_val, y_test = split_data(texts, labels)
-    
-    # Предобработка и векторизация
-    processed_texts = [
-        enhanced_preprocess_text(text, remove_personal_data_flag=True)
-        for text in X_train
-    ]
-    
+def preprocess_texts(texts, n_jobs=-1, batch_size=256):
+    """Предобрабатывает корпус параллельно по процессам (один раз для всех задач)."""
+    return Parallel(n_jobs=n_jobs, prefer="processes", batch_size=batch_size)(
+        delayed(enhanced_preprocess_text)(text, remove_personal_data_flag=True)
+        for text in texts
+    )
+
+def build_vectorizer(processed_texts, train_idx, hyperparams):
+    """
+    Обучает общий для всех задач TF-IDF векторизатор на обучающих строках.
+
+    Словарь и IDF строятся только по train_idx (валидационные и тестовые письма
+    не влияют на признаки), затем векторизуется весь корпус.
+    """
     vectorizer = TfidfVectorizer(
         max_features=hyperparams['max_features'],
         ngram_range=hyperparams['ngram_range'],
         min_df=hyperparams['min_df'],
         max_df=hyperparams['max_df']
     )
-    X_train_vectors = vectorizer.fit_transform(processed_texts)
+    vectorizer.fit([processed_texts[i] for i in train_idx])
+    X_all = vectorizer.transform(processed_texts)
+    return vectorizer, X_all
+
+def train_task_model(X_all, labels, train_idx, task_name, hyperparams):
+    """Обучает классификатор для конкретной задачи на обучающих строках общей матрицы признаков."""
+    # Срезы CSR-матрицы по индексам строк дешевые
+    X_train_vectors = X_all[train_idx]
+    y_train = labels[train_idx]
     
     # Обучение модели
     classifier = LogisticRegression(
@@ -63,7 +78,7 @@ def train_task_model(texts, labels, task_name, hyperparams):
     )
     classifier.fit(X_train_vectors, y_train)
     
-    return vectorizer, classifier
+    return classifier
 
 def save_hyperparameters(hyperparams, filename='parameters.txt'):
     """Сохраняет гиперпараметры в файл."""
@@ -89,6 +104,19 @@ def main():
     # Загружаем данные
     texts, types, urgencies, tones = load_data('data.csv')
     
+    # Предобработка не зависит от задачи: выполняем один раз до разбиения
+    print("Предобработка текстов...")
+    processed_texts = preprocess_texts(texts)
+    
+    # Векторизатор общий для всех задач, поэтому и разбиение одно: иначе валидационные
+    # и тестовые письма одной задачи попадали бы в обучение словаря для другой
+    row_indices = np.arange(len(texts))
+    train_idx, val_idx, test_idx, _, _, _ = split_data(row_indices, types)
+    
+    # Векторизатор один на все задачи: токенизация и IDF считаются один раз
+    print("Обучение векторизатора...")
+    vectorizer, X_all = build_vectorizer(processed_texts, train_idx, hyperparams)
+    
     # Обучаем модели для каждой задачи
     tasks = {
         'type': types,
@@ -96,20 +124,24 @@ def main():
         'tone': tones
     }
     
-    models = {}
+    classifiers = {}
     
     for task_name, labels in tasks.items():
         print(f"Обучение модели для {task_name}...")
-        vectorizer, classifier = train_task_model(texts, labels, task_name, hyperparams)
-        
-        models[task_name] = {
-            'vectorizer': vectorizer,
-            'classifier': classifier
-        }
-        
-        # Сохраняем модели в папку models
-        joblib.dump(vectorizer, os.path.join(MODELS_DIR, f'vectorizer_{task_name}.pkl'))
-        joblib.dump(classifier, os.path.join(MODELS_DIR, f'classifier_{task_name}.pkl'))
+        classifiers[task_name] = train_task_model(X_all, labels, train_idx, task_name, hyperparams)
+    
+    # Сохраняем все модели одним файлом без сжатия, чтобы массивы можно было отобразить через mmap
+    joblib.dump(
+        {'vectorizer': vectorizer, 'classifiers': classifiers},
+        os.path.join(MODELS_DIR, BUNDLE_FILE)
+    )
+    
+    # Отдельные файлы старого формата не соответствуют новым моделям
+    for task_name in tasks:
+        for prefix in ('vectorizer', 'classifier'):
+            legacy_path = os.path.join(MODELS_DIR, f'{prefix}_{task_name}.pkl')
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
     
     print("Обучение завершено! Модели сохранены в папку 'models'")
 
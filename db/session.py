@@ -1,16 +1,51 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 from core.config import settings
 
-# Create database engine (только SQLite)
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite настройка
-    echo=settings.DEBUG
+# Параметры пула соединений (для серверных БД: Postgres и т.п.)
+POOL_SIZE = 10
+MAX_OVERFLOW = 5
+POOL_TIMEOUT = 30
+POOL_RECYCLE = 1800
+
+# PRAGMA для SQLite: WAL позволяет читать во время записи, кэш страниц 64 МБ
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",
 )
 
+is_sqlite = settings.DATABASE_URL.startswith("sqlite")
+
+# Create database engine
+if is_sqlite:
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},  # SQLite настройка
+        echo=settings.DEBUG
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Настраивает каждое новое соединение SQLite один раз при открытии"""
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+else:
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True,
+        echo=settings.DEBUG
+    )
+
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: после commit атрибуты не сбрасываются, ответ строится без повторного SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Create base class for models
 Base = declarative_base()
@@ -32,35 +32,35 @@ def to_letter_type(classification: str) -> LetterType:
         return LetterType.APPROVAL_REQUEST
 
 
+# Количество дней до дедлайна ответа по типу письма
+_REPLY_DEADLINE_DAYS: dict[LetterType, int] = {
+    LetterType.OFFICIAL_COMPLAINT_OR_CLAIM: 3,   # Жалобы требуют быстрого ответа
+    LetterType.REGULATORY_REQUEST: 5,            # Регуляторные запросы – средний срок
+    LetterType.INFORMATION_DOCUMENT_REQUEST: 7,  # Запросы документов – стандартный срок
+    LetterType.PARTNERSHIP_PROPOSAL: 14,         # Партнёрские предложения – больше времени
+    LetterType.NOTIFICATION_OR_INFORMATION: 1,   # Уведомления – быстрый ответ
+    LetterType.APPROVAL_REQUEST: 7,              # Запросы на одобрение – стандартный срок
+}
+
+# Формальный стиль для жалоб и регуляторных запросов, остальные — деловой
+_LETTER_STYLES: dict[LetterType, LetterStyle] = {
+    LetterType.OFFICIAL_COMPLAINT_OR_CLAIM: LetterStyle.FORMAL,
+    LetterType.REGULATORY_REQUEST: LetterStyle.FORMAL,
+}
+
+
 def get_reply_deadline_days(letter_type: LetterType) -> int:
     """
     Возвращает количество дней до дедлайна ответа в зависимости от типа письма.
     """
-    mapping: dict[LetterType, int] = {
-        LetterType.OFFICIAL_COMPLAINT_OR_CLAIM: 3,   # Жалобы требуют быстрого ответа
-        LetterType.REGULATORY_REQUEST: 5,            # Регуляторные запросы – средний срок
-        LetterType.INFORMATION_DOCUMENT_REQUEST: 7,  # Запросы документов – стандартный срок
-        LetterType.PARTNERSHIP_PROPOSAL: 14,         # Партнёрские предложения – больше времени
-        LetterType.NOTIFICATION_OR_INFORMATION: 1,   # Уведомления – быстрый ответ
-        LetterType.APPROVAL_REQUEST: 7,              # Запросы на одобрение – стандартный срок
-    }
-    return mapping.get(letter_type, 7)
+    return _REPLY_DEADLINE_DAYS.get(letter_type, 7)
 
 
 def get_letter_style(letter_type: LetterType) -> LetterStyle:
     """
     Определяет стиль письма (формальный / деловой) на основе типа письма.
     """
-    if letter_type in (
-        LetterType.OFFICIAL_COMPLAINT_OR_CLAIM,
-        LetterType.REGULATORY_REQUEST,
-    ):
-        return LetterStyle.FORMAL
-
-    if letter_type is LetterType.PARTNERSHIP_PROPOSAL:
-        return LetterStyle.BUSINESS
-
-    return LetterStyle.BUSINESS
+    return _LETTER_STYLES.get(letter_type, LetterStyle.BUSINESS)
 
 
 __all__ = [
@@ -1,10 +1,18 @@
-from .llm_client import YandexGPTGenerator, get_generator
-from .prompts import load_system_prompt, generate_reply
+from .cache import LLMCache, get_llm_cache, get_reply_cache
+from .llm_client import YandexGPTError, YandexGPTGenerator, get_generator, close_generator, unload_generator
+from .prompts import load_system_prompt, generate_reply, generate_reply_batch
 
 __all__ = [
+    "LLMCache",
+    "get_llm_cache",
+    "get_reply_cache",
+    "YandexGPTError",
     "YandexGPTGenerator",
     "get_generator",
+    "close_generator",
+    "unload_generator",
     "load_system_prompt",
     "generate_reply",
+    "generate_reply_batch",
 ]
 
@@ -0,0 +1,155 @@
+"""
+Кэши ответов YandexGPT.
+
+LLMCache на уровне запроса к API хранит ответы только при temperature == 0:
+тогда одинаковый запрос дает одинаковый результат. Кэш ответов на письма
+хранит готовые ответы на повторяющиеся письма (с точностью до регистра и пробелов).
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Protocol
+
+import orjson
+
+# Время жизни записи по умолчанию, секунды
+DEFAULT_TTL = 3600
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст письма к нормальной форме: регистр и пробельные символы не учитываются."""
+    return " ".join(text.casefold().split())
+
+
+class CacheBackend(Protocol):
+    """Внешнее хранилище кэша (например, Redis) — второй уровень после памяти процесса"""
+
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        ...
+
+
+class LLMCache:
+    """LRU‑кэш ответов LLM в памяти процесса с TTL и счетчиками попаданий"""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        default_ttl: int = DEFAULT_TTL,
+        backend: Optional[CacheBackend] = None,
+    ):
+        """
+        Args:
+            maxsize: Максимальное число записей в памяти
+            default_ttl: Время жизни записи в секундах
+            backend: Необязательное внешнее хранилище
+        """
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.backend = backend
+        # key -> (момент истечения, ответ); порядок ключей — порядок использования
+        self._data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(
+        model_uri: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+    ) -> str:
+        """Формирует ключ по каноническому представлению запроса."""
+        canonical = orjson.dumps(
+            {"model": model_uri, "messages": messages, "temperature": temperature, "maxTokens": max_tokens},
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return hashlib.sha256(canonical).hexdigest()
+
+    @staticmethod
+    def make_reply_key(
+        classification: str,
+        text: str,
+        fields: Dict,
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+    ) -> str:
+        """Ключ ответа на письмо: текст нормализуется, поля и промпт входят в ключ как есть."""
+        canonical = orjson.dumps(
+            {
+                "classification": classification,
+                "text": normalize_text(text),
+                "fields": fields,
+                "system": system_prompt,
+                "temperature": temperature,
+                "maxTokens": max_tokens,
+            },
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+            default=str,
+        )
+        return hashlib.sha256(canonical).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Возвращает ответ из кэша или None."""
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            del self._data[key]
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value, self.default_ttl)
+                self.stats["hits"] += 1
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        """Сохраняет ответ в кэш."""
+        ttl = self.default_ttl if ttl is None else ttl
+        self._store(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, ttl)
+
+    def _store(self, key: str, value: str, ttl: int) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def metrics(self) -> Dict[str, int]:
+        """Счетчики кэша для /metrics."""
+        return {**self.stats, "size": len(self._data)}
+
+
+# Глобальные экземпляры кэшей
+_llm_cache_instance: Optional[LLMCache] = None
+_reply_cache_instance: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    """Получает глобальный экземпляр кэша ответов LLM"""
+    global _llm_cache_instance
+    if _llm_cache_instance is None:
+        _llm_cache_instance = LLMCache()
+    return _llm_cache_instance
+
+
+def get_reply_cache() -> LLMCache:
+    """Получает глобальный экземпляр кэша ответов на письма"""
+    global _reply_cache_instance
+    if _reply_cache_instance is None:
+        _reply_cache_instance = LLMCache()
+    return _reply_cache_instance
+
+
+__all__ = ["CacheBackend", "LLMCache", "get_llm_cache", "get_reply_cache", "normalize_text"]
@@ -4,15 +4,85 @@
 Содержит только низкоуровневую HTTP‑логику без доменных правил и шаблонов.
 """
 
+import asyncio
 import os
-import json
-from typing import Optional, Dict, List
+import random
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Dict, List
 
-import requests
+import aiohttp
+import orjson
 from dotenv import load_dotenv
 
+from .cache import LLMCache, get_llm_cache
+
 load_dotenv()
 
+# Пул соединений: общий лимит и лимит на хост API
+POOL_LIMIT = 64
+POOL_LIMIT_PER_HOST = 16
+# Таймауты: установка соединения и ожидание очередной порции ответа
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 120
+# Время жизни кэша DNS для хоста API, секунды
+DNS_CACHE_TTL = 300
+# Одновременных запросов к API по умолчанию (YANDEX_MAX_CONCURRENCY)
+DEFAULT_MAX_CONCURRENCY = 8
+# Повторы при временных ошибках API и обрыве соединения с экспоненциальной задержкой
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.3
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+# Превышение лимита запросов (429): больше попыток и дольше ожидание
+RATE_LIMIT_RETRIES = 4
+RATE_LIMIT_BACKOFF = 0.5
+MAX_BACKOFF = 8
+
+# Длина текста сообщения, до которой он обрезается в тексте ошибки
+ERROR_MESSAGE_TEXT_LIMIT = 500
+
+
+@lru_cache(maxsize=16)
+def _system_message(text: str) -> Dict[str, str]:
+    """Сообщение с системным промптом; общее для всех запросов с этим промптом, не изменяется."""
+    return {"role": "system", "text": text}
+
+
+def _backoff(initial: float, attempt: int) -> float:
+    """Экспоненциальная задержка со случайной добавкой, чтобы повторы клиентов не совпадали."""
+    return min(MAX_BACKOFF, initial * 2 ** attempt) + random.uniform(0, initial)
+
+
+class YandexGPTError(Exception):
+    """Ошибка ответа YandexGPT API; подробное сообщение формируется только при str()"""
+
+    def __init__(self, status: int, reason: Optional[str], body: bytes, payload: Dict):
+        super().__init__(status, reason)
+        self.status = status
+        self.reason = reason
+        self.body = body
+        self.payload = payload
+
+    def __str__(self) -> str:
+        try:
+            error_detail = orjson.loads(self.body)
+        except Exception:
+            error_detail = self.body.decode("utf-8", errors="replace")[:200]
+
+        # Тексты сообщений обрезаются, чтобы не выводить письмо целиком
+        payload = {
+            **self.payload,
+            "messages": [
+                {**message, "text": message["text"][:ERROR_MESSAGE_TEXT_LIMIT]}
+                for message in self.payload.get("messages", ())
+            ],
+        }
+        return (
+            f"Ошибка YandexGPT API: {self.status} {self.reason}\n"
+            f"Детали: {error_detail}\n"
+            f"Запрос: {orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()}"
+        )
+
 
 class YandexGPTGenerator:
     """Класс для работы с YandexGPT API"""
@@ -22,6 +92,8 @@ class YandexGPTGenerator:
         api_key: Optional[str] = None,
         folder_id: Optional[str] = None,
         model_uri: Optional[str] = None,
+        cache: Optional[LLMCache] = None,
+        max_concurrency: Optional[int] = None,
     ):
         """
         Инициализация подключения к YandexGPT
@@ -30,6 +102,8 @@ class YandexGPTGenerator:
             api_key: API ключ (или из YANDEX_API_KEY)
             folder_id: ID каталога (или из YANDEX_FOLDER_ID)
             model_uri: URI модели (по умолчанию yandexgpt/latest)
+            cache: Кэш ответов для temperature == 0 (по умолчанию глобальный)
+            max_concurrency: Максимум одновременных запросов к API (или из YANDEX_MAX_CONCURRENCY)
         """
         self.api_key = api_key or os.getenv("YANDEX_API_KEY")
         self.folder_id = folder_id or os.getenv("YANDEX_FOLDER_ID")
@@ -55,13 +129,48 @@ class YandexGPTGenerator:
             "Content-Type": "application/json",
         }
 
+        self.cache = cache if cache is not None else get_llm_cache()
+
+        # Ограничение одновременных запросов под лимит API
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("YANDEX_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Сессия создается лениво внутри работающего event loop и переиспользует соединения
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает HTTP-сессию, создавая ее при первом запросе."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=POOL_LIMIT,
+                    limit_per_host=POOL_LIMIT_PER_HOST,
+                    ttl_dns_cache=DNS_CACHE_TTL,
+                ),
+                timeout=aiohttp.ClientTimeout(total=None, connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT),
+                headers=self.headers,
+            )
+        return self._session
+
+    async def aclose(self) -> None:
+        """Закрывает HTTP-сессию и соединения пула."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "YandexGPTGenerator":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
     def _create_messages(self, prompt: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
         """Создает список сообщений для API."""
-        messages: List[Dict[str, str]] = []
+        user_message = {"role": "user", "text": prompt}
         if system_prompt:
-            messages.append({"role": "system", "text": system_prompt})
-        messages.append({"role": "user", "text": prompt})
-        return messages
+            return [_system_message(system_prompt), user_message]
+        return [user_message]
 
     def _create_payload(
         self,
@@ -81,20 +190,40 @@ class YandexGPTGenerator:
             "messages": messages,
         }
 
-    def _get_error_message(self, error: requests.exceptions.HTTPError, payload: Dict) -> str:
-        """Формирует подробное сообщение об ошибке."""
-        try:
-            error_detail = error.response.json()
-        except Exception:
-            error_detail = error.response.text[:200]
+    @asynccontextmanager
+    async def _post(self, payload: Dict) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Отправляет запрос, повторяя его при временных ошибках; отдает успешный ответ."""
+        session = self._get_session()
+        # Тело сериализуется один раз в байты; Content-Type задан в заголовках сессии
+        body = orjson.dumps(payload)
+        async with self._semaphore:
+            attempt = 0
+            while True:
+                try:
+                    response = await session.post(self.base_url, data=body)
+                except aiohttp.ClientConnectionError:
+                    if attempt >= MAX_RETRIES:
+                        raise
+                    delay = _backoff(BACKOFF_FACTOR, attempt)
+                else:
+                    if response.status == 429 and attempt < RATE_LIMIT_RETRIES:
+                        delay = _backoff(RATE_LIMIT_BACKOFF, attempt)
+                    elif response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                        delay = _backoff(BACKOFF_FACTOR, attempt)
+                    else:
+                        break
+                    response.release()
+                await asyncio.sleep(delay)
+                attempt += 1
 
-        return (
-            f"Ошибка YandexGPT API: {error}\n"
-            f"Детали: {error_detail}\n"
-            f"Запрос: {json.dumps(payload, ensure_ascii=False, indent=2)}"
-        )
+            try:
+                if response.status >= 400:
+                    raise YandexGPTError(response.status, response.reason, await response.read(), payload)
+                yield response
+            finally:
+                response.release()
 
-    def generate(
+    async def generate(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
@@ -105,17 +234,28 @@ class YandexGPTGenerator:
         messages = self._create_messages(prompt, system_prompt)
         payload = self._create_payload(messages, temperature, max_tokens, stream=False)
 
+        # Детерминированный запрос: повторный вызов API вернет тот же ответ
+        cache_key = None
+        if temperature == 0:
+            cache_key = self.cache.make_key(self.model_uri, messages, temperature, max_tokens)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            return result["result"]["alternatives"][0]["message"]["text"]
-        except requests.exceptions.HTTPError as e:
-            raise Exception(self._get_error_message(e, payload))
-        except requests.exceptions.RequestException as e:
+            async with self._post(payload) as response:
+                result = orjson.loads(await response.read())
+            text = result["result"]["alternatives"][0]["message"]["text"]
+        except orjson.JSONDecodeError as e:
+            raise Exception(f"Некорректный ответ YandexGPT API: {e}")
+        except aiohttp.ClientError as e:
             raise Exception(f"Ошибка подключения: {e}")
 
-    def generate_stream(
+        if cache_key is not None:
+            self.cache.set(cache_key, text)
+        return text
+
+    async def generate_stream(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
@@ -127,46 +267,52 @@ class YandexGPTGenerator:
         payload = self._create_payload(messages, temperature, max_tokens, stream=True)
 
         try:
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json=payload,
-                stream=True,
-            )
-            response.raise_for_status()
+            async with self._post(payload) as response:
+                async for line in response.content:
+                    line = line.rstrip(b"\r\n")
+                    if not line:
+                        continue
 
-            for line in response.iter_lines():
-                if not line:
-                    continue
+                    # orjson разбирает байты напрямую, без промежуточного decode
+                    if not line.startswith(b"data: "):
+                        continue
 
-                line_str = line.decode("utf-8")
-                if not line_str.startswith("data: "):
-                    continue
+                    data_bytes = line[6:]
+                    if data_bytes == b"[DONE]":
+                        break
 
-                data_str = line_str[6:]
-                if data_str == "[DONE]":
-                    break
+                    try:
+                        data = orjson.loads(data_bytes)
+                        if "result" in data and "alternatives" in data["result"]:
+                            text = data["result"]["alternatives"][0].get("message", {}).get("text", "")
+                            if text:
+                                yield text
+                    except orjson.JSONDecodeError:
+                        continue
 
-                try:
-                    data = json.loads(data_str)
-                    if "result" in data and "alternatives" in data["result"]:
-                        text = data["result"]["alternatives"][0].get("message", {}).get("text", "")
-                        if text:
-                            yield text
-                except json.JSONDecodeError:
-                    continue
-
-        except requests.exceptions.HTTPError as e:
-            raise Exception(self._get_error_message(e, payload))
-        except requests.exceptions.RequestException as e:
+        except aiohttp.ClientError as e:
             raise Exception(f"Ошибка подключения: {e}")
 
 
+@lru_cache(maxsize=1)
 def get_generator() -> YandexGPTGenerator:
-    """Создает генератор с настройками из .env."""
+    """Получает общий для процесса генератор с настройками из .env (одна HTTP-сессия на процесс)."""
     return YandexGPTGenerator()
 
 
-__all__ = ["YandexGPTGenerator", "get_generator"]
+async def close_generator() -> None:
+    """Закрывает HTTP-сессию общего генератора и сбрасывает его (при остановке приложения)."""
+    if get_generator.cache_info().currsize:
+        generator = get_generator()
+        get_generator.cache_clear()
+        await generator.aclose()
+
+
+def unload_generator() -> None:
+    """Синхронный вариант close_generator для кода вне event loop (скрипты, консоль)."""
+    asyncio.run(close_generator())
+
+
+__all__ = ["YandexGPTError", "YandexGPTGenerator", "get_generator", "close_generator", "unload_generator"]
 
 
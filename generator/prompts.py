@@ -5,13 +5,40 @@
 и построения пользовательского промпта с контекстом.
 """
 
-import json
+import asyncio
+import logging
+import string
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from .cache import get_reply_cache
 from .llm_client import YandexGPTGenerator, get_generator
 
+logger = logging.getLogger(__name__)
 
+# Текст письма длиннее _MAX_INPUT_CHARS (~2k токенов) обрезается перед отправкой в модель,
+# письмо длиннее _HARD_INPUT_CHARS не отправляется вовсе
+_MAX_INPUT_CHARS = 8192
+_HARD_INPUT_CHARS = 65536
+_TRUNCATED_MARKER = "\n[...текст обрезан...]"
+
+# Шаблонные ответы без обращения к модели: тип письма -> (файл в generator/templates, обязательные поля).
+# Используются, только если классификатор уверен в типе не меньше _TEMPLATE_MIN_CONFIDENCE
+_TEMPLATES_DIR = Path(__file__).parent / "templates"
+_TEMPLATE_REPLIES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "Notification or Information": ("notification.txt", ()),
+    "Information/Document Request": ("document_request.txt", ("contract_numbers",)),
+}
+_TEMPLATE_MIN_CONFIDENCE = 0.8
+
+
+# Файлы системного промпта по умолчанию в порядке приоритета; путь определяется один раз при импорте
+_SYSTEM_PROMPT_CANDIDATES = (Path(__file__).parent.parent / "system_prompt.md",)
+_SYSTEM_PROMPT_PATH = next((path for path in _SYSTEM_PROMPT_CANDIDATES if path.exists()), None)
+
+
+@lru_cache(maxsize=8)
 def load_system_prompt(prompt_file: str | None = None) -> str:
     """
     Загружает системный промпт.
@@ -19,33 +46,27 @@ def load_system_prompt(prompt_file: str | None = None) -> str:
     Приоритет источников:
     1. Явно переданный файл prompt_file
     2. system_prompt.md в корне проекта
+
+    Файл читается один раз на процесс; для перечитывания вызовите load_system_prompt.cache_clear().
     """
-    # 1) Если передали конкретный файл – пробуем его
-    if prompt_file is not None:
+    prompt_path = _SYSTEM_PROMPT_PATH
+    if prompt_file is not None and Path(prompt_file).exists():
         prompt_path = Path(prompt_file)
-        if prompt_path.exists():
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-
-    # 2) Пробуем system_prompt.md рядом с корнем проекта
-    system_md = Path(__file__).parent.parent / "system_prompt.md"
-    if system_md.exists():
-        with open(system_md, "r", encoding="utf-8") as f:
-            return f.read().strip()
-
-    raise FileNotFoundError(
-        "Не удалось найти системный промпт.\n"
-        "Создайте файл system_prompt.md в корне проекта "
-        "или укажите путь к промпту явно."
-    )
 
+    if prompt_path is None:
+        raise FileNotFoundError(
+            "Не удалось найти системный промпт.\n"
+            "Создайте файл system_prompt.md в корне проекта "
+            "или укажите путь к промпту явно."
+        )
 
-def _get_style_guidance(classification: str) -> str:
-    """
-    Возвращает рекомендации по стилю для конкретного типа письма.
-    """
-    style_guides = {
-        "Official Complaint or Claim": """
+    with open(prompt_path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+# Рекомендации по стилю для каждого типа письма
+_STYLE_GUIDES: Dict[str, str] = {
+    "Official Complaint or Claim": """
 СТИЛЬ ДЛЯ ОФИЦИАЛЬНОЙ ЖАЛОБЫ/ПРЕТЕНЗИИ:
 - Извиняющийся и понимающий тон
 - Признание проблемы и ответственности банка
@@ -53,7 +74,7 @@ def _get_style_guidance(classification: str) -> str:
 - Указание сроков рассмотрения и ответа
 - Предложение компенсации или исправления ситуации (если уместно)
 - Контактные данные для дальнейшего общения""",
-        "Regulatory Request": """
+    "Regulatory Request": """
 СТИЛЬ ДЛЯ РЕГУЛЯТОРНОГО ЗАПРОСА:
 - Официальный, формальный стиль
 - Ссылки на нормативные акты и регламенты
@@ -61,7 +82,7 @@ def _get_style_guidance(classification: str) -> str:
 - Соблюдение требований регулятора
 - Структурированное изложение информации
 - Указание на соответствие требованиям""",
-        "Partnership Proposal": """
+    "Partnership Proposal": """
 СТИЛЬ ДЛЯ ПАРТНЕРСКОГО ПРЕДЛОЖЕНИЯ:
 - Деловой, заинтересованный тон
 - Профессиональная оценка предложения
@@ -69,7 +90,7 @@ def _get_style_guidance(classification: str) -> str:
 - Предложение дальнейших шагов (встреча, переговоры)
 - Благодарность за предложение
 - Контактные данные ответственного лица""",
-        "Information/Document Request": """
+    "Information/Document Request": """
 СТИЛЬ ДЛЯ ЗАПРОСА ИНФОРМАЦИИ/ДОКУМЕНТОВ:
 - Четкий, структурированный ответ
 - Указание конкретных документов и сроков предоставления
@@ -77,7 +98,7 @@ def _get_style_guidance(classification: str) -> str:
 - Требования к оформлению (если есть)
 - Контактные данные для уточнений
 - Благодарность за обращение""",
-        "Notification or Information": """
+    "Notification or Information": """
 СТИЛЬ ДЛЯ УВЕДОМЛЕНИЯ/ИНФОРМАЦИИ:
 - Информативный, нейтральный стиль
 - Четкое изложение фактов
@@ -85,7 +106,7 @@ def _get_style_guidance(classification: str) -> str:
 - Важные детали выделены
 - Контактные данные для вопросов
 - Профессиональный тон""",
-        "Approval Request": """
+    "Approval Request": """
 СТИЛЬ ДЛЯ ЗАПРОСА НА ОДОБРЕНИЕ/СОГЛАСОВАНИЕ:
 - Профессиональный деловой тон
 - Четкость и конкретность в изложении
@@ -93,21 +114,145 @@ def _get_style_guidance(classification: str) -> str:
 - Готовность предоставить дополнительную информацию
 - Указание сроков рассмотрения
 - Вежливое обращение""",
-    }
+}
 
-    return style_guides.get(
-        classification,
-        """
+_DEFAULT_STYLE = """
 СТИЛЬ ДЛЯ ОБЩЕГО ПИСЬМА:
 - Профессиональный деловой тон
 - Четкость и конкретность
 - Вежливое обращение
 - Структурированное изложение
-- Готовность к сотрудничеству""",
+- Готовность к сотрудничеству"""
+
+
+# Пользовательский промпт: только данные конкретного письма; тип и стиль письма — в системном промпте.
+# Постоянный текст задается один раз, подставляются только переменные части
+_USER_PROMPT_TEMPLATE = """ИЗВЛЕЧЕННЫЕ ПОЛЯ ИЗ ВХОДЯЩЕГО ПИСЬМА:
+{fields_str}
+
+ТЕКСТ ВХОДЯЩЕГО ПИСЬМА:
+{text}
+
+ЗАДАЧА:
+Сгенерируй официальное деловое письмо банка, которое:
+1. Соответствует официальному уровню деловой переписки
+2. Адаптировано под тип письма ({classification})
+3. Исключает юридические ошибки
+4. Соблюдает корпоративный стиль банка
+5. Использует извлеченные поля точно как указано
+6. Имеет правильную структуру делового письма
+
+ВАЖНО:
+- Не выдумывай информацию, которой нет во входящем письме
+- Используй только указанные даты, номера договоров, суммы
+- Соблюдай профессиональный тон банка
+- Избегай юридических формулировок, которые могут создать риски"""
+
+
+@lru_cache(maxsize=64)
+def _compose_system_prompt(base_system_prompt: str, classification: str) -> str:
+    """
+    Дополняет системный промпт типом письма и рекомендациями по стилю.
+
+    Для каждого типа письма получается неизменный префикс запроса, который API может
+    переиспользовать между запросами; результат кэшируется.
+    """
+    style_guidance = _get_style_guidance(classification)
+    return f"{base_system_prompt}\n\nТИП ПИСЬМА: {classification.upper()}\n{style_guidance}"
+
+
+def _format_fields(fields: Dict, indent: int = 0) -> str:
+    """
+    Выводит извлеченные поля строками «- ключ: значение» (вложенные — с отступом).
+
+    Пустые значения пропускаются; скобки и кавычки JSON модели не нужны и только тратят токены.
+    """
+    pad = "  " * indent
+    lines = []
+    for key, value in fields.items():
+        if value is None or value == "" or value == [] or value == {}:
+            continue
+        if isinstance(value, dict):
+            nested = _format_fields(value, indent + 1)
+            if nested:
+                lines.append(f"{pad}- {key}:")
+                lines.append(nested)
+        elif isinstance(value, (list, tuple)):
+            if len(value) == 1 and not isinstance(value[0], (dict, list, tuple)):
+                lines.append(f"{pad}- {key}: {value[0]}")
+            else:
+                lines.append(f"{pad}- {key}:")
+                lines.extend(
+                    f"{pad}  -\n{_format_fields(item, indent + 2)}" if isinstance(item, dict)
+                    else f"{pad}  - {item}"
+                    for item in value
+                )
+        else:
+            lines.append(f"{pad}- {key}: {value}")
+    return "\n".join(lines)
+
+
+# Шаблоны пользовательского промпта для известных типов писем: тип уже подставлен,
+# при вызове остаются только поля и текст письма
+_USER_PROMPT_TEMPLATES: Dict[str, str] = {
+    classification: _USER_PROMPT_TEMPLATE.replace("{classification}", classification)
+    for classification in _STYLE_GUIDES
+}
+
+
+def _build_user_prompt(classification: str, fields_str: str, text: str) -> str:
+    """Собирает пользовательский промпт по шаблону для типа письма."""
+    template = _USER_PROMPT_TEMPLATES.get(classification)
+    if template is not None:
+        return template.format_map({"fields_str": fields_str, "text": text})
+    return _USER_PROMPT_TEMPLATE.format_map({
+        "classification": classification,
+        "fields_str": fields_str,
+        "text": text,
+    })
+
+
+@lru_cache(maxsize=None)
+def _load_reply_template(file_name: str) -> string.Template:
+    """Загружает шаблон ответа (один раз на процесс)."""
+    with open(_TEMPLATES_DIR / file_name, "r", encoding="utf-8") as f:
+        return string.Template(f.read().strip())
+
+
+def _render_template_reply(classification: str, fields: Optional[Dict], confidence: Optional[float]) -> Optional[str]:
+    """
+    Возвращает шаблонный ответ для типовых писем или None, если нужен ответ модели.
+
+    Шаблон применяется, когда тип письма имеет шаблон, уверенность классификатора
+    достаточна и все обязательные поля извлечены.
+    """
+    spec = _TEMPLATE_REPLIES.get(classification)
+    if spec is None or confidence is None or confidence < _TEMPLATE_MIN_CONFIDENCE:
+        return None
+
+    fields = fields or {}
+    file_name, required_fields = spec
+    if not all(fields.get(name) for name in required_fields):
+        return None
+
+    def first(value):
+        return value[0] if isinstance(value, (list, tuple)) else value
+
+    sender_name = fields.get("sender_name")
+    return _load_reply_template(file_name).substitute(
+        greeting=f"Уважаемый(ая) {sender_name}!" if sender_name else "Добрый день!",
+        contract_number=first(fields.get("contract_numbers") or ""),
     )
 
 
-def generate_reply(
+def _get_style_guidance(classification: str) -> str:
+    """
+    Возвращает рекомендации по стилю для конкретного типа письма.
+    """
+    return _STYLE_GUIDES.get(classification, _DEFAULT_STYLE)
+
+
+async def generate_reply(
     text: str,
     classification: str,
     fields: Dict,
@@ -116,12 +261,29 @@ def generate_reply(
     system_prompt_override: Optional[str] = None,
     temperature: float = 0.6,
     max_tokens: int = 2000,
+    use_cache: bool = True,
+    confidence: Optional[float] = None,
 ) -> str:
     """
     Генерирует официальное деловое письмо банка высокого уровня.
+
+    Повторное письмо с тем же текстом (без учета регистра и пробелов), типом и полями
+    получает ранее сгенерированный ответ без обращения к API (use_cache=False отключает кэш).
+
+    Текст длиннее 8192 символов обрезается с пометкой; текст длиннее 65536 символов
+    отклоняется с ValueError без обращения к API.
+
+    Если передана уверенность классификатора (confidence), типовые уведомления и запросы
+    документов могут получить шаблонный ответ из generator/templates без обращения к API.
     """
-    if generator is None:
-        generator = get_generator()
+    if len(text) > _HARD_INPUT_CHARS:
+        raise ValueError(
+            f"Текст письма слишком длинный: {len(text)} символов (максимум {_HARD_INPUT_CHARS})"
+        )
+
+    templated_reply = _render_template_reply(classification, fields, confidence)
+    if templated_reply is not None:
+        return templated_reply
 
     # Загружаем системный промпт
     if system_prompt_override:
@@ -131,47 +293,82 @@ def generate_reply(
     else:
         system_prompt = load_system_prompt()
 
-    # Получаем рекомендации по стилю для данного типа письма
-    style_guidance = _get_style_guidance(classification)
+    reply_cache = get_reply_cache()
+    cache_key = None
+    if use_cache:
+        cache_key = reply_cache.make_reply_key(
+            classification, text, fields, system_prompt, temperature, max_tokens
+        )
+        cached = reply_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    # Формируем промпт с контекстом
-    fields_str = json.dumps(fields, ensure_ascii=False, indent=2) if fields else "Не найдено"
+    if len(text) > _MAX_INPUT_CHARS:
+        logger.warning(
+            "Текст письма обрезан до %d символов (исходная длина %d)", _MAX_INPUT_CHARS, len(text)
+        )
+        text = text[:_MAX_INPUT_CHARS] + _TRUNCATED_MARKER
 
-    user_prompt = f"""ТИП ПИСЬМА: {classification.upper()}
+    # Тип письма и рекомендации по стилю — в системном промпте, данные письма — в пользовательском
+    system_prompt = _compose_system_prompt(system_prompt, classification)
+    fields_str = (_format_fields(fields) if fields else "") or "Не найдено"
 
-{style_guidance}
+    user_prompt = _build_user_prompt(classification, fields_str, text)
 
-ИЗВЛЕЧЕННЫЕ ПОЛЯ ИЗ ВХОДЯЩЕГО ПИСЬМА:
-{fields_str}
-
-ТЕКСТ ВХОДЯЩЕГО ПИСЬМА:
-{text}
-
-ЗАДАЧА:
-Сгенерируй официальное деловое письмо банка, которое:
-1. Соответствует официальному уровню деловой переписки
-2. Адаптировано под тип письма ({classification})
-3. Исключает юридические ошибки
-4. Соблюдает корпоративный стиль банка
-5. Использует извлеченные поля точно как указано
-6. Имеет правильную структуру делового письма
-
-ВАЖНО:
-- Не выдумывай информацию, которой нет во входящем письме
-- Используй только указанные даты, номера договоров, суммы
-- Соблюдай профессиональный тон банка
-- Избегай юридических формулировок, которые могут создать риски"""
+    if generator is None:
+        generator = get_generator()
 
-    reply = generator.generate(
+    reply = await generator.generate(
         prompt=user_prompt,
         system_prompt=system_prompt,
         temperature=temperature,
         max_tokens=max_tokens,
     )
 
-    return reply.strip()
+    reply = reply.strip()
+    if cache_key is not None:
+        reply_cache.set(cache_key, reply)
+    return reply
+
+
+async def generate_reply_batch(
+    items: Iterable[Tuple[str, str, Dict]],
+    generator: Optional[YandexGPTGenerator] = None,
+    prompt_file: Optional[str] = None,
+    system_prompt_override: Optional[str] = None,
+    temperature: float = 0.6,
+    max_tokens: int = 2000,
+    use_cache: bool = True,
+) -> List[str]:
+    """
+    Генерирует ответы на пакет писем параллельно.
+
+    items — последовательность (текст, тип письма, извлеченные поля). Запросы выполняются
+    одновременно в пределах лимита генератора; ответы возвращаются в порядке items.
+    При ошибке любого запроса остальные отменяются, а ошибка пробрасывается (ExceptionGroup).
+    """
+    if generator is None:
+        generator = get_generator()
+
+    async with asyncio.TaskGroup() as tg:
+        tasks = [
+            tg.create_task(generate_reply(
+                text=text,
+                classification=classification,
+                fields=fields,
+                generator=generator,
+                prompt_file=prompt_file,
+                system_prompt_override=system_prompt_override,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+            ))
+            for text, classification, fields in items
+        ]
+
+    return [task.result() for task in tasks]
 
 
-__all__ = ["load_system_prompt", "generate_reply"]
+__all__ = ["load_system_prompt", "generate_reply", "generate_reply_batch"]
 
 
@@ -1,11 +1,22 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
 from api.routes import router
 from api.admin_routes import router as admin_router
-from db.session import engine, Base
+from api.auth_middleware import AdminAuthMiddleware
+from db.session import engine
 from core.config import settings
+from generator import close_generator, get_llm_cache, get_reply_cache
+from services.email_sender import close_email_sender
+from services.field_extractor import get_field_extractor
+from services.generate_answer import CLASSIFICATION_TO_TEMPLATE, load_system_prompt, load_template
+from services.ml_batcher import close_ml_batcher, get_ml_batcher
+from services.ml_classifier import close_preprocess_pool
 import logging
-from models import letter
+from scripts.init_db import init_db
 
 logger = logging.getLogger(__name__)
 
@@ -14,19 +25,27 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-def init_db():
-    """Инициализация базы данных с обработкой ошибок"""
+def check_db():
+    """Быстрая проверка соединения с БД (SELECT 1); с AUTO_CREATE_TABLES — init_db (ошибки только в лог)"""
+    if settings.AUTO_CREATE_TABLES:
+        try:
+            init_db()
+        except Exception as e:
+            logger.warning(f"⚠ Не удалось инициализировать базу данных: {e}")
+            logger.warning("Приложение запустится, но функции работы с БД будут недоступны")
+            logger.warning("Проверьте DATABASE_URL в .env (по умолчанию используется SQLite: sqlite:///./letters.db)")
+        return
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("✓ База данных инициализирована успешно")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✓ База данных доступна")
     except Exception as e:
         logger.warning(f"⚠ Не удалось подключиться к базе данных: {e}")
-        logger.warning("Приложение запустится, но функции работы с БД будут недоступны")
-        logger.warning(f"Проверьте DATABASE_URL в .env (по умолчанию используется SQLite: sqlite:///./letters.db)")
+        logger.warning("Проверьте DATABASE_URL в .env и выполните: python -m scripts.init_db")
 
 
 def check_ml_availability():
-    """Проверяет доступность ML компонентов при старте"""
+    """Проверяет доступность ML компонентов (загружает модели)"""
     try:
         from services.ml_classifier import get_ml_classifier
         ml_classifier = get_ml_classifier()
@@ -39,20 +58,68 @@ def check_ml_availability():
         logger.error("  1. Установлены зависимости: pip install joblib scikit-learn pandas pymorphy3")
         logger.error("  2. Обучены модели: запустите data_processing/training.py")
         logger.error("  3. Модели находятся в папке data_processing/models/")
+        logger.warning("⚠ ВНИМАНИЕ: ML недоступен, обработка писем будет невозможна!")
         return False
 
 
+def warm_up():
+    """
+    Прогрев при старте: модели, экстрактор полей, системный промпт и шаблоны
+
+    Пробная классификация подгружает ленивые импорты sklearn/scipy,
+    чтобы первый запрос не платил за холодный старт.
+    """
+    ml_ready = check_ml_availability()
+    try:
+        if ml_ready:
+            from services.ml_classifier import get_ml_classifier
+            get_ml_classifier().classify("Прогрев классификатора")
+        get_field_extractor()
+        load_system_prompt()
+        for classification in CLASSIFICATION_TO_TEMPLATE:
+            load_template(classification)
+        logger.info("✓ Прогрев завершен")
+    except Exception as e:
+        logger.warning(f"⚠ Прогрев не завершен: {e}")
+    return ml_ready
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Жизненный цикл приложения.
+
+    Таблицы не создаются при импорте: их создает python -m scripts.init_db
+    (или AUTO_CREATE_TABLES=true для разработки), здесь только проверка соединения.
+    ML модели загружаются и прогреваются в фоне вместе с промптами и шаблонами, не задерживая
+    старт (health check отвечает сразу); запросы, пришедшие до окончания загрузки, дожидаются ее.
+    Классификация писем идет пачками через ML батчер.
+    При остановке закрываются пул предобработки, HTTP-сессия YandexGPT и SMTP-соединения.
+    """
+    await asyncio.to_thread(check_db)
+    app.state.ml_preload = asyncio.create_task(asyncio.to_thread(warm_up))
+    get_ml_batcher().start()
+    yield
+    await close_ml_batcher()
+    await asyncio.to_thread(close_preprocess_pool)
+    await close_generator()
+    await close_email_sender()
+
+
 app = FastAPI(
     title=settings.APP_NAME,
     description="Backend для обработки писем с использованием AI (YandexGPT) - ТОЛЬКО ML",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-init_db()
-
-ml_available = check_ml_availability()
-if not ml_available:
-    logger.warning("⚠ ВНИМАНИЕ: ML недоступен, обработка писем будет невозможна!")
+# Проверка токена админа до маршрутизации; добавлена раньше CORS,
+# чтобы ответы 401 тоже получали CORS-заголовки
+app.add_middleware(
+    AdminAuthMiddleware,
+    prefix="/api/v1/admin",
+    public_paths={"/api/v1/admin/auth/login"},
+)
 
 # CORS middleware должен быть добавлен ДО роутеров
 app.add_middleware(
@@ -89,13 +156,29 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Метрики приложения: попадания и промахи кэшей ответов LLM"""
+    return {
+        "llm_cache": get_llm_cache().metrics(),
+        "reply_cache": get_reply_cache().metrics(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
+    # Перезагрузка по изменению файлов только для разработки (DEBUG); иначе — несколько воркеров
+    reload = settings.DEBUG
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        reload=reload,
+        workers=settings.worker_count,
+        log_level="info",
+        # auto: uvloop и httptools, если установлены (uvicorn[standard]), иначе asyncio и h11
+        loop="auto",
+        http="auto",
+        access_log=settings.DEBUG
     )
 
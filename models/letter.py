@@ -1,6 +1,8 @@
 from typing import Optional
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 from db.session import Base
 import enum
@@ -28,20 +30,43 @@ class LetterStatus(str, enum.Enum):
     SENT = "sent"  # Отправлено адресанту
 
 
+class EnumString(TypeDecorator):
+    """
+    Строковая колонка со значением enum: в БД обычный VARCHAR без CHECK-ограничения
+    и типа enum, при чтении значение превращается в член enum.
+    """
+    impl = String(16)
+    cache_ok = True
+
+    def __init__(self, enum_cls: type[enum.Enum]):
+        super().__init__()
+        self.enum_cls = enum_cls
+
+    def process_bind_param(self, value, dialect):
+        # Член enum (основной случай: значение уже прошло @validates) пишется без повторного разбора
+        if isinstance(value, self.enum_cls):
+            return value.value
+        return None if value is None else self.enum_cls(value).value
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.enum_cls(value)
+
+
 class Letter(Base):
     __tablename__ = "letters"
 
     id = Column(Integer, primary_key=True, index=True)
-    received_date = Column(DateTime(timezone=True), nullable=False, index=True, default=func.now())  # Дата получения письма
+    received_date = Column(DateTime(timezone=True), nullable=False, index=True, server_default=func.now())  # Дата получения письма
     sender_name = Column(String(255), nullable=True)  # Имя адресанта
     sender_email = Column(String(255), nullable=True, index=True)  # Email адресанта для отправки ответа
     original_text = Column(Text, nullable=False)  # Текст входящего письма
-    letter_style = Column(SQLEnum(LetterStyle, native_enum=False), nullable=False)  # Стиль письма
+    letter_style = Column(EnumString(LetterStyle), nullable=False)  # Стиль письма
     reply_deadline = Column(DateTime(timezone=True), nullable=False, index=True)  # Срок до которого надо отправить ответ
-    urgency = Column(SQLEnum(LetterUrgency, native_enum=False), nullable=False, default=LetterUrgency.MEDIUM, index=True)  # Срочность письма
+    urgency = Column(EnumString(LetterUrgency), nullable=False, default=LetterUrgency.MEDIUM, index=True)  # Срочность письма
     
     # Статус обработки
-    status = Column(SQLEnum(LetterStatus, native_enum=False), nullable=False, default=LetterStatus.PENDING_APPROVAL, index=True)
+    # Отдельный индекс не нужен: status — первая колонка составных индексов ниже
+    status = Column(EnumString(LetterStatus), nullable=False, default=LetterStatus.PENDING_APPROVAL)
     
     # Ответы
     generated_answer = Column(Text, nullable=False)  # Сгенерированный ответ через AI
@@ -53,6 +78,37 @@ class Letter(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        # Курсорная пагинация по (received_date, id); B-tree индекс читается в обе стороны
+        Index("ix_letters_received_date_id", "received_date", "id"),
+        # Фильтр по статусу/срочности в админке + сортировка по дате получения;
+        # на Postgres INCLUDE отправителя позволяет отвечать на список только по индексу
+        Index(
+            "ix_letters_status_received_date", "status", "received_date",
+            postgresql_include=["sender_email", "sender_name"],
+        ),
+        Index("ix_letters_urgency_received_date", "urgency", "received_date"),
+        # Письма по статусу в порядке срока ответа
+        Index(
+            "ix_letters_status_deadline", "status", "reply_deadline",
+            postgresql_include=["sender_email", "sender_name"],
+        ),
+    )
+    # Серверные значения (id, created_at, updated_at) забираются через RETURNING в том же INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Допустимость значений проверяется в Python при присваивании, а не CHECK в БД
+    _ENUM_COLUMNS = {
+        "letter_style": LetterStyle,
+        "urgency": LetterUrgency,
+        "status": LetterStatus,
+    }
+
+    @validates("letter_style", "urgency", "status")
+    def _validate_enum(self, key, value):
+        """Принимает член enum или его строковое значение; неизвестное значение → ValueError"""
+        return self._ENUM_COLUMNS[key](value)
+
     def __repr__(self):
         return f"<Letter(id={self.id}, sender_name={self.sender_name}, status={self.status}, received_date={self.received_date})>"
 
@@ -5,7 +5,12 @@ from .letter import (
     LetterEditRequest,
     LetterApprovalRequest,
     LetterDetailResponse,
-    LetterListResponse
+    LetterListResponse,
+    LetterListItem,
+    LetterSummaryListResponse,
+    PageCursor,
+    SortBy,
+    SortOrder
 )
 from .history import (
     GenerateRequest,
@@ -22,6 +27,11 @@ __all__ = [
     "LetterApprovalRequest",
     "LetterDetailResponse",
     "LetterListResponse",
+    "LetterListItem",
+    "LetterSummaryListResponse",
+    "PageCursor",
+    "SortBy",
+    "SortOrder",
     "GenerateRequest",
     "GenerateResponse",
     "HistoryResponse",
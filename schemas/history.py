@@ -6,11 +6,12 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 from models.letter import LetterStatus
+from schemas.letter import MAX_LETTER_TEXT_CHARS, PageCursor
 
 
 class GenerateRequest(BaseModel):
     """Схема запроса на генерацию ответа"""
-    text: str = Field(..., description="Текст входящего письма", min_length=1)
+    text: str = Field(..., description="Текст входящего письма", min_length=1, max_length=MAX_LETTER_TEXT_CHARS)
     sender_name: Optional[str] = Field(None, max_length=255, description="Имя отправителя")
     sender_email: Optional[str] = Field(None, description="Email отправителя")
 
@@ -45,4 +46,5 @@ class HistoryResponse(BaseModel):
     """Схема ответа со списком истории"""
     items: list[HistoryItem]
     total: int
+    next_cursor: Optional[PageCursor] = None
 
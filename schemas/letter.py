@@ -1,14 +1,47 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import AfterValidator, BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
 from models.letter import LetterStyle, LetterStatus, LetterUrgency
+import enum
+import re
+
+# Предел длины текста письма: совпадает с generator.prompts._HARD_INPUT_CHARS, чтобы слишком
+# длинное письмо отклонялось с 422 до классификации, а не с ValueError (500) при генерации
+MAX_LETTER_TEXT_CHARS = 65536
+
+# Облегченная проверка адреса: одна "@", без пробелов, точка в домене (без DNS и разбора RFC)
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+def _validate_email_fast(value: Optional[str]) -> Optional[str]:
+    # fullmatch, а не match с «$»: «$» пропускает завершающий перевод строки,
+    # который потом попал бы в заголовок To письма
+    if value and not _EMAIL_RE.fullmatch(value):
+        raise ValueError("Некорректный email адрес")
+    return value
+
+
+FastEmail = Annotated[Optional[str], AfterValidator(_validate_email_fast)]
+
+
+class SortBy(str, enum.Enum):
+    """Поле сортировки списка писем"""
+    URGENCY = "urgency"
+    RECEIVED_DATE = "received_date"
+    DEADLINE = "deadline"
+
+
+class SortOrder(str, enum.Enum):
+    """Порядок сортировки"""
+    ASC = "asc"
+    DESC = "desc"
 
 
 class LetterRequest(BaseModel):
     """Схема запроса на обработку письма"""
-    text: str = Field(..., description="Текст входящего письма", min_length=1)
+    text: str = Field(..., description="Текст входящего письма", min_length=1, max_length=MAX_LETTER_TEXT_CHARS)
     sender_name: Optional[str] = Field(None, max_length=255, description="Имя адресанта")
-    sender_email: Optional[EmailStr] = Field(None, description="Email адресанта для отправки ответа")
+    sender_email: FastEmail = Field(None, max_length=255, description="Email адресанта для отправки ответа")
 
 
 class LetterProcessResponse(BaseModel):
@@ -53,11 +86,48 @@ class LetterDetailResponse(BaseModel):
 
     model_config = {"from_attributes": True}
 
+    @classmethod
+    def from_orm_fast(cls, letter) -> "LetterDetailResponse":
+        """
+        Собирает ответ из ORM-объекта Letter без валидации полей.
+
+        Безопасно только для строк из таблицы letters: типы колонок совпадают с полями схемы
+        (enum-колонки при чтении уже превращаются в члены enum).
+        """
+        return cls.model_construct(**{name: getattr(letter, name) for name in _LETTER_DETAIL_FIELDS})
+
+
+_LETTER_DETAIL_FIELDS = tuple(LetterDetailResponse.model_fields)
+
+
+class PageCursor(BaseModel):
+    """Курсор для постраничного получения списка (последнее письмо страницы)"""
+    after_received_date: datetime
+    after_id: int
+
 
 class LetterListResponse(BaseModel):
     """Схема ответа со списком писем"""
     items: list[LetterDetailResponse]
     total: int
+    next_cursor: Optional[PageCursor] = None
+
+
+class LetterListItem(BaseModel):
+    """Краткая информация о письме для строки списка"""
+    id: int
+    sender_name: Optional[str]
+    status: LetterStatus
+    urgency: LetterUrgency
+    received_date: datetime
+    reply_deadline: datetime
+
+
+class LetterSummaryListResponse(BaseModel):
+    """Схема ответа с кратким списком писем"""
+    items: list[LetterListItem]
+    total: int
+    next_cursor: Optional[PageCursor] = None
 
 
 class LetterResponse(BaseModel):
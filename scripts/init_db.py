@@ -0,0 +1,60 @@
+"""
+Создание таблиц базы данных.
+
+Запускается один раз перед стартом сервера:
+    python -m scripts.init_db
+"""
+
+import logging
+import sys
+
+from sqlalchemy import text
+
+from db.session import engine, Base
+from models import letter  # noqa: F401 — регистрирует модели в Base.metadata
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_enum_values(conn) -> None:
+    """
+    Приводит значения enum-колонок к значениям enum (в нижнем регистре).
+
+    Раньше колонки хранили имена членов enum (PENDING_APPROVAL), теперь — значения
+    (pending_approval); для всех enum письма значение совпадает с именем в нижнем регистре.
+    """
+    conn.execute(text(
+        "UPDATE letters SET status = lower(status), urgency = lower(urgency), letter_style = lower(letter_style) "
+        "WHERE status <> lower(status) OR urgency <> lower(urgency) OR letter_style <> lower(letter_style)"
+    ))
+
+
+def init_db():
+    """
+    Создает таблицы и индексы, удаляет устаревший индекс и нормализует значения enum
+
+    :raises Exception: Ошибка подключения или миграции (не подавляется)
+    """
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # create_all не добавляет новые индексы в уже существующие таблицы
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        # Индекс по одному status покрывается составными индексами (status, ...)
+        conn.execute(text("DROP INDEX IF EXISTS ix_letters_status"))
+        normalize_enum_values(conn)
+    logger.info("✓ База данных инициализирована успешно")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        init_db()
+    except Exception as e:
+        logger.error(f"✗ Не удалось инициализировать базу данных: {e}")
+        logger.error("Проверьте DATABASE_URL в .env (по умолчанию используется SQLite: sqlite:///./letters.db)")
+        sys.exit(1)
@@ -1,6 +1,6 @@
-from .letter_processor import LetterProcessor
-from .email_sender import EmailSender
-from .field_extractor import FieldExtractor
+from .letter_processor import LetterProcessor, get_letter_processor
+from .email_sender import EmailSender, get_email_sender, close_email_sender
+from .field_extractor import FieldExtractor, get_field_extractor
 
 # Опциональные ML импорты
 try:
@@ -13,8 +13,12 @@ except ImportError:  # pragma: no cover - optional dependency
 
 __all__ = [
     "LetterProcessor",
+    "get_letter_processor",
     "EmailSender",
+    "get_email_sender",
+    "close_email_sender",
     "FieldExtractor",
+    "get_field_extractor",
 ]
 
 if ML_AVAILABLE:
@@ -2,20 +2,29 @@
 Сервис аутентификации для админа
 """
 
+import hmac
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from core.config import settings
-from schemas.auth import TokenData
 
-security = HTTPBearer()
+# Схема Bearer для OpenAPI и require_admin; без токена ошибку формирует require_admin
+security = HTTPBearer(auto_error=False)
+
+# Кэш проверенных токенов: повторные запросы с тем же токеном не пересчитывают HMAC
+TOKEN_CACHE_SIZE = 4096
+TOKEN_CACHE_TTL = 60
+# (token, SECRET_KEY) -> (момент истечения, payload)
+_token_cache: "OrderedDict[tuple[str, str], tuple[float, dict]]" = OrderedDict()
 
 
 def authenticate_admin(password: str) -> bool:
-    """Аутентификация админа по паролю из .env"""
-    return password == settings.ADMIN_PASSWORD
+    """Аутентификация админа по паролю из .env (сравнение за постоянное время)"""
+    return hmac.compare_digest(password.encode("utf-8"), settings.ADMIN_PASSWORD.encode("utf-8"))
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -30,26 +39,61 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def get_current_admin(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> bool:
+def decode_token(token: str) -> dict:
+    """
+    Проверяет подпись и срок действия JWT и возвращает payload.
+
+    Результат кэшируется на min(оставшийся срок токена, TOKEN_CACHE_TTL) секунд.
+
+    Raises:
+        JWTError: Если токен невалиден или истек
+    """
+    key = (token, settings.SECRET_KEY)
+    now = time.monotonic()
+    entry = _token_cache.get(key)
+    if entry is not None:
+        expires_at, payload = entry
+        if expires_at > now:
+            _token_cache.move_to_end(key)
+            return payload
+        del _token_cache[key]
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    ttl = TOKEN_CACHE_TTL
+    exp = payload.get("exp")
+    if exp is not None:
+        ttl = min(ttl, exp - time.time())
+    if ttl > 0:
+        _token_cache[key] = (now + ttl, payload)
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload
+
+
+def clear_token_cache() -> None:
+    """Сбрасывает кэш токенов (например, после смены SECRET_KEY)"""
+    _token_cache.clear()
+
+
+async def require_admin(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(security)
+) -> None:
     """
-    Зависимость для проверки валидности JWT токена админа.
-    Используется для защиты эндпоинтов.
+    Зависимость защищенных эндпоинтов: проверяет JWT токен админа.
+
+    Основную проверку делает AdminAuthMiddleware до маршрутизации; зависимость — страховка
+    на случай, если путь запроса не совпал с префиксом middleware (доступ тогда закрыт).
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if credentials is None:
+        raise credentials_exception
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        admin: bool = payload.get("admin", False)
-        if not admin:
-            raise credentials_exception
+        payload = decode_token(credentials.credentials)
     except JWTError:
         raise credentials_exception
-    
-    return True
-
+    if not payload.get("admin", False):
+        raise credentials_exception
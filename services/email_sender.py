@@ -1,12 +1,18 @@
 from typing import Optional
+import asyncio
 import logging
+import queue
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Число одновременно открытых SMTP-соединений
+SMTP_POOL_SIZE = 3
+
 
 class EmailSender:
     """Сервис для отправки email писем"""
@@ -29,6 +35,10 @@ class EmailSender:
                 "SMTP настройки не заданы. Email отправка будет логироваться, но не отправляться. "
                 "Установите SMTP_HOST, SMTP_USER, SMTP_PASSWORD в .env файле"
             )
+        
+        # Пул авторизованных SMTP-соединений: TLS и AUTH выполняются один раз на соединение
+        self._idle: "queue.LifoQueue[smtplib.SMTP]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(SMTP_POOL_SIZE)
     
     async def send_email(
         self,
@@ -52,38 +62,123 @@ class EmailSender:
         Raises:
             Exception: Если произошла ошибка при отправке
         """
-        recipient = f"{to_name} <{to_email}>" if to_name else to_email
-        
         if not self.smtp_host or not self.smtp_user:
-            logger.info(f"[ЗАГЛУШКА] Отправка email:")
-            logger.info(f"  Получатель: {recipient}")
-            logger.info(f"  Тема: {subject}")
-            logger.info(f"  Тело: {body[:200]}...")
+            # Форматирование строк только если INFO-записи вообще будут выведены
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "[ЗАГЛУШКА] Отправка email:\n  Получатель: %s\n  Тема: %s\n  Тело: %.200s...",
+                    self._recipient(to_email, to_name), subject, body
+                )
             logger.warning("SMTP не настроен. Письмо не отправлено. Настройте SMTP в .env файле.")
             return True
         
         try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.from_name} <{self.from_email}>"
-            msg['To'] = to_email
-            
-            text_part = MIMEText(body, 'plain', 'utf-8')
-            msg.attach(text_part)
+            # smtplib блокирующий: сборка письма и SMTP-сессия выполняются в потоке, не блокируя event loop
+            await asyncio.to_thread(self._send_sync, to_email, subject, body)
             
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.use_tls:
-                    server.starttls()
-                
-                if self.smtp_user and self.smtp_password:
-                    server.login(self.smtp_user, self.smtp_password)
-                
-                server.send_message(msg)
-            
-            logger.info(f"Email успешно отправлен: {recipient}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Email успешно отправлен: %s", self._recipient(to_email, to_name))
             return True
             
         except Exception as e:
-            logger.error(f"Ошибка при отправке email: {e}")
+            logger.error("Ошибка при отправке email: %s", e)
             raise Exception(f"Не удалось отправить email: {str(e)}")
+    
+    @staticmethod
+    def _recipient(to_email: str, to_name: Optional[str]) -> str:
+        return f"{to_name} <{to_email}>" if to_name else to_email
+    
+    def _build_message(self, to_email: str, subject: str, body: str) -> MIMEMultipart:
+        """Собирает MIME-письмо"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = f"{self.from_name} <{self.from_email}>"
+        msg['To'] = to_email
+        
+        text_part = MIMEText(body, 'plain', 'utf-8')
+        msg.attach(text_part)
+        return msg
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Открывает новое SMTP-соединение: подключение, TLS, авторизация"""
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+        try:
+            if self.use_tls:
+                server.starttls()
+            
+            if self.smtp_user and self.smtp_password:
+                server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    @staticmethod
+    def _noop_ok(server: smtplib.SMTP) -> bool:
+        """Проверяет, что соединение еще живо (сервер мог закрыть его по таймауту)"""
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+    
+    @staticmethod
+    def _discard(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+    
+    def _get_conn(self) -> smtplib.SMTP:
+        """Берет живое соединение из пула или открывает новое"""
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._noop_ok(server):
+                return server
+            self._discard(server)
+    
+    def _send_sync(self, to_email: str, subject: str, body: str) -> None:
+        """Синхронная отправка: сборка письма и отправка через соединение из пула"""
+        msg = self._build_message(to_email, subject, body)
+        with self._slots:
+            server = self._get_conn()
+            try:
+                server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Соединение оборвалось между NOOP и отправкой — одна попытка на новом
+                self._discard(server)
+                server = self._connect()
+                server.send_message(msg)
+            except Exception:
+                self._discard(server)
+                raise
+            self._idle.put(server)
+    
+    def close(self) -> None:
+        """Закрывает все соединения пула"""
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
+
+# Глобальный экземпляр сервиса отправки
+_email_sender_instance = None
+
+
+def get_email_sender() -> EmailSender:
+    """Получает глобальный экземпляр сервиса отправки email"""
+    global _email_sender_instance
+    if _email_sender_instance is None:
+        _email_sender_instance = EmailSender()
+    return _email_sender_instance
+
 
+async def close_email_sender() -> None:
+    """Закрывает SMTP-соединения глобального сервиса (вызывается при остановке приложения)"""
+    if _email_sender_instance is not None:
+        await asyncio.to_thread(_email_sender_instance.close)
@@ -4,59 +4,135 @@
 Интегрирован с data_processing/preprocessing.py для улучшенного извлечения
 """
 
+import logging
 import re
-import sys
-from pathlib import Path
 from typing import Dict, List, Optional
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 # Пытаемся использовать улучшенное извлечение из data_processing
 ML_EXTRACTION_AVAILABLE = False
 ml_extract_entities = None
 
 try:
-    data_processing_path = Path(__file__).parent.parent / "data_processing"
-    if data_processing_path.exists():
-        sys.path.insert(0, str(data_processing_path.parent))
-        from data_processing.preprocessing import extract_entities as ml_extract_entities
-        ML_EXTRACTION_AVAILABLE = True
+    from data_processing.preprocessing import extract_entities as ml_extract_entities
+    ML_EXTRACTION_AVAILABLE = True
 except ImportError:
     # ML извлечение недоступно, используем только базовое
     ML_EXTRACTION_AVAILABLE = False
     ml_extract_entities = None
 
 
+def _combine(patterns: List[str], flags: int = 0) -> "re.Pattern[str]":
+    """Объединяет паттерны в одну альтернацию; i-й паттерн — именованная группа p<i>"""
+    return re.compile("|".join(f"(?P<p{i}>{p})" for i, p in enumerate(patterns)), flags)
+
+
+# Окна поиска имени отправителя в длинном письме: начало, конец и запас на границе окна
+_SENDER_HEAD_CHARS = 400
+_SENDER_TAIL_CHARS = 400
+_SENDER_MARGIN = 60
+
+# Символы, которые могут стоять внутри номера или суммы (границы окна не разрезают их)
+_TOKEN_CHARS = frozenset("-/.,№#")
+
+
+def _in_token(text: str, i: int) -> bool:
+    """Входит ли символ text[i] в номер/сумму: буква, цифра, разделитель или пробел между цифрами"""
+    ch = text[i]
+    if ch.isalnum() or ch in _TOKEN_CHARS:
+        return True
+    return ch == " " and 0 < i < len(text) - 1 and text[i - 1].isdigit() and text[i + 1].isdigit()
+
+
+def _anchor_windows(text: str, anchors: "re.Pattern[str]", before: int, after: int) -> List[tuple]:
+    """
+    Окна текста вокруг опорных слов: дорогие паттерны применяются только к ним.
+
+    Границы окна расширяются до границ токенов, пересекающиеся окна объединяются.
+    """
+    windows = []
+    n = len(text)
+    for m in anchors.finditer(text):
+        start = max(0, m.start() - before)
+        end = min(n, m.end() + after)
+        while start > 0 and _in_token(text, start - 1):
+            start -= 1
+        while end < n and _in_token(text, end):
+            end += 1
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
 class FieldExtractor:
     """Извлекает структурированные данные из текста письма"""
     
     def __init__(self):
-        # Паттерны для извлечения данных
-        self.date_patterns = [
+        # Паттерны для извлечения данных. Паттерны одной группы объединены в одну альтернацию
+        # с именованными группами: текст просматривается один раз, а не по разу на паттерн
+        self._dates_combined = _combine([
             r'\d{1,2}[./-]\d{1,2}[./-]\d{2,4}',  # ДД.ММ.ГГГГ или ДД/ММ/ГГГГ
             r'\d{4}[./-]\d{1,2}[./-]\d{1,2}',  # ГГГГ.ММ.ДД
-            r'\d{1,2}\s+(январ|феврал|март|апрел|май|июн|июл|август|сентябр|октябр|ноябр|декабр)[а-я]*\s+\d{4}',
-            r'\d{1,2}\s+(янв|фев|мар|апр|май|июн|июл|авг|сен|окт|ноя|дек)[а-я.]*\s+\d{4}',
-        ]
+            r'\d{1,2}\s+(?:январ|феврал|март|апрел|май|июн|июл|август|сентябр|октябр|ноябр|декабр)[а-я]*\s+\d{4}',
+            r'\d{1,2}\s+(?:янв|фев|мар|апр|май|июн|июл|авг|сен|окт|ноя|дек)[а-я.]*\s+\d{4}',
+        ], re.IGNORECASE)
         
-        self.contract_patterns = [
+        # Паттерны номеров пересекаются («Договор № Д-12345» и «Д-12345»), поэтому каждый
+        # применяется отдельно: общая альтернация теряла бы вложенные совпадения
+        self._contract_res = [re.compile(p, re.IGNORECASE) for p in [
             r'(?:договор|контракт|соглашение|дог\.?)\s*[№#]?\s*[А-Яа-я]?[-]?\d+',
             r'[№#]\s*\d+[-/]\d+',  # Номер вида №123-45
             r'[А-Я]{1,3}[-]?\d+',  # Буквенно-цифровой номер (Д-12345)
-        ]
+        ]]
+        # Номера ищутся только рядом с этими словами: иначе буквенно-цифровой паттерн
+        # проверяется у каждой буквы текста
+        self._contract_anchors = re.compile(r'договор|контракт|соглашени|дог|номер|[№#]', re.IGNORECASE)
         
-        self.amount_patterns = [
+        self._amounts_combined = _combine([
             r'\d{1,3}(?:\s?\d{3})*(?:[.,]\d{2})?\s*(?:руб|рублей|руб\.|₽|RUB)',
             r'\d{1,3}(?:\s?\d{3})*(?:[.,]\d{2})?\s*(?:usd|доллар|долл\.|\$)',
             r'\d{1,3}(?:\s?\d{3})*(?:[.,]\d{2})?\s*(?:eur|евро|€)',
             r'\d{1,3}(?:\s?\d{3})*(?:[.,]\d{2})?',  # Просто число (может быть суммой)
-        ]
+        ], re.IGNORECASE)
+        # Суммы ищутся только рядом с валютой и денежными словами, а не у каждого числа
+        self._amount_anchors = re.compile(
+            r'руб|₽|rub|usd|доллар|долл|\$|eur|евро|€|сумм|размер|оплат|платеж|платёж|стоимост|задолженност|штраф|комисси',
+            re.IGNORECASE
+        )
         
         # Ключевые фразы для извлечения
-        self.key_phrases_patterns = [
+        self._key_phrases_combined = _combine([
             r'(?:срок|дата|до|который день)\s+\d{1,2}[./-]\d{1,2}[./-]\d{2,4}',
             r'(?:сумма|размер|объем|количество)\s+\d+',
             r'(?:номер|№|#)\s*\d+',
-        ]
+        ], re.IGNORECASE)
+        
+        # Паттерны для поиска имени в начале письма (в порядке приоритета). Каждый ищется
+        # отдельно: в общей альтернации «^…» съедал бы приветствие вместе с именем после него
+        self._sender_res = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in [
+            r'(?:с\s+уважением|уважаем|здравствуйте|добрый\s+(?:день|вечер|утро)),?\s+([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)',
+            r'^([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)',
+            r'(?:подпис|от\s+лица|инициатор):\s*([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)',
+        ]]
+        
+        # Фразы с важными словами: предложение берется, если содержит любое из слов
+        self._important_words = (
+            "срочно", "важно", "необходимо", "требуется", "прошу",
+            "жалоба", "претензия", "требование", "запрос", "обращение"
+        )
+        self._sentence_split_re = re.compile(r'[.!?]\s+')
+        
+        self._email_re = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+        
+        # Российский номер: +7 или 8, затем 10 цифр; границы по цифрам не дают
+        # принять за телефон часть счета или номера договора
+        self._phone_re = re.compile(
+            r'(?<!\d)(?:\+7|8)[-\s]?\(?\d{3}\)?[-\s]?\d{3}[-.\s]?\d{2}[-.\s]?\d{2}(?!\d)'
+        )
     
     def extract_dates(self, text: str) -> List[str]:
         """
@@ -65,15 +141,10 @@ class FieldExtractor:
         :param text: Текст письма
         :return: Список найденных дат
         """
-        dates = []
+        dates = [m.group(0) for m in self._dates_combined.finditer(text)]
         
-        for pattern in self.date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            dates.extend(matches)
-        
-        # Удаляем дубликаты и сортируем
-        unique_dates = list(set(dates))
-        return unique_dates
+        # Удаляем дубликаты, сохраняя порядок появления в тексте
+        return list(dict.fromkeys(dates))
     
     def extract_contract_numbers(self, text: str) -> List[str]:
         """
@@ -82,21 +153,21 @@ class FieldExtractor:
         :param text: Текст письма
         :return: Список найденных номеров
         """
-        contract_numbers = []
-        
-        for pattern in self.contract_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            contract_numbers.extend(matches)
+        windows = _anchor_windows(text, self._contract_anchors, 20, 80)
+        contract_numbers = [
+            m.group(0)
+            for rx in self._contract_res
+            for start, end in windows
+            for m in rx.finditer(text, start, end)
+        ]
         
-        # Очищаем и нормализуем
-        cleaned = []
+        # Очищаем (убираем лишние пробелы) и удаляем дубликаты, сохраняя порядок
+        seen = {}
         for num in contract_numbers:
-            # Убираем лишние пробелы
-            cleaned_num = re.sub(r'\s+', ' ', num.strip())
-            if cleaned_num not in cleaned:
-                cleaned.append(cleaned_num)
+            # split/join схлопывает пробельные символы так же, как re.sub(r'\s+', ' '), но без regex
+            seen.setdefault(' '.join(num.split()), None)
         
-        return cleaned
+        return list(seen)
     
     def extract_amounts(self, text: str) -> List[str]:
         """
@@ -105,15 +176,14 @@ class FieldExtractor:
         :param text: Текст письма
         :return: Список найденных сумм
         """
-        amounts = []
-        
-        for pattern in self.amount_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            amounts.extend(matches)
+        amounts = [
+            m.group(0)
+            for start, end in _anchor_windows(text, self._amount_anchors, 40, 40)
+            for m in self._amounts_combined.finditer(text, start, end)
+        ]
         
-        # Удаляем дубликаты
-        unique_amounts = list(set(amounts))
-        return unique_amounts
+        # Удаляем дубликаты, сохраняя порядок появления в тексте
+        return list(dict.fromkeys(amounts))
     
     def extract_key_phrases(self, text: str, max_phrases: int = 10) -> List[str]:
         """
@@ -125,20 +195,18 @@ class FieldExtractor:
         """
         phrases = []
         
-        # Извлекаем фразы с важными словами
-        important_words = [
-            "срочно", "важно", "необходимо", "требуется", "прошу",
-            "жалоба", "претензия", "требование", "запрос", "обращение"
-        ]
-        
-        sentences = re.split(r'[.!?]\s+', text)
-        
-        for sentence in sentences:
+        # Короткие предложения отбрасываются до поиска слов; ищем до max_phrases фраз
+        for sentence in self._sentence_split_re.split(text):
+            sentence = sentence.strip()
+            if len(sentence) <= 10:
+                continue
             sentence_lower = sentence.lower()
-            for word in important_words:
-                if word in sentence_lower and len(sentence.strip()) > 10:
-                    phrases.append(sentence.strip())
+            for word in self._important_words:
+                if word in sentence_lower:
+                    phrases.append(sentence)
                     break
+            if len(phrases) == max_phrases:
+                break
         
         # Ограничиваем количество
         return phrases[:max_phrases]
@@ -150,15 +218,19 @@ class FieldExtractor:
         :param text: Текст письма
         :return: Имя отправителя или None
         """
-        # Паттерны для поиска имени в начале письма
-        patterns = [
-            r'(?:с\s+уважением|уважаем|здравствуйте|добрый\s+(?:день|вечер|утро)),?\s+([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)',
-            r'^([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)',
-            r'(?:подпис|от\s+лица|инициатор):\s*([А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+)',
-        ]
+        # Имя стоит в приветствии или в подписи: в длинном письме просматриваются только
+        # начало и конец (окна с запасом, чтобы не обрезать имя на границе)
+        if len(text) <= _SENDER_HEAD_CHARS + _SENDER_TAIL_CHARS:
+            windows = [(0, len(text))]
+        else:
+            windows = [
+                (0, _SENDER_HEAD_CHARS + _SENDER_MARGIN),
+                (len(text) - _SENDER_TAIL_CHARS - _SENDER_MARGIN, len(text)),
+            ]
         
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        # Паттерны в порядке приоритета; для каждого берется первое совпадение в окнах
+        for rx in self._sender_res:
+            match = next(filter(None, (rx.search(text, start, end) for start, end in windows)), None)
             if match:
                 name = match.group(1).strip()
                 # Проверяем, что это похоже на имя (не слишком длинное)
@@ -174,8 +246,7 @@ class FieldExtractor:
         :param text: Текст письма
         :return: Email адрес или None
         """
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        match = re.search(email_pattern, text)
+        match = self._email_re.search(text)
         return match.group(0) if match else None
     
     def extract_phone(self, text: str) -> Optional[str]:
@@ -185,17 +256,11 @@ class FieldExtractor:
         :param text: Текст письма
         :return: Номер телефона или None
         """
-        phone_patterns = [
-            r'\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9}',
-            r'\+7\s?\(?\d{3}\)?\s?\d{3}[-.\s]?\d{2}[-.\s]?\d{2}',
-        ]
-        
-        for pattern in phone_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(0).strip()
-        
-        return None
+        # Без «+» и «8» номера в тексте нет: регулярное выражение не запускаем
+        if '+' not in text and '8' not in text:
+            return None
+        match = self._phone_re.search(text)
+        return match.group(0) if match else None
     
     def extract_all(self, text: str) -> Dict:
         """
@@ -215,12 +280,10 @@ class FieldExtractor:
                 f"2. Функция extract_entities доступна\n"
                 f"3. Установлены зависимости: pip install pymorphy3"
             )
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(error_msg)
             raise RuntimeError(error_msg)
         
-        base_result = {
+        result = {
             "dates": self.extract_dates(text),
             "contract_numbers": self.extract_contract_numbers(text),
             "amounts": self.extract_amounts(text),
@@ -233,15 +296,13 @@ class FieldExtractor:
         try:
             ml_entities = ml_extract_entities(text)
             
-            result = {
-                "dates": list(set(base_result["dates"] + ml_entities.get("dates", []))),
-                "contract_numbers": list(set(base_result["contract_numbers"] + ml_entities.get("contract_numbers", []))),
-                "amounts": base_result["amounts"],
-                "key_phrases": base_result["key_phrases"],
-                "sender_name": ml_entities.get("names", [None])[0] if ml_entities.get("names") else base_result["sender_name"],
-                "email": base_result["email"],
-                "phone": base_result["phone"]
-            }
+            # ML сущности дополняют базовый результат на месте; пустые списки не сливаем
+            for key in ("dates", "contract_numbers"):
+                ml_values = ml_entities.get(key)
+                if ml_values:
+                    result[key] = list(dict.fromkeys((*result[key], *ml_values)))
+            if ml_entities.get("names"):
+                result["sender_name"] = ml_entities["names"][0]
             
             if ml_entities.get("account_numbers"):
                 result["account_numbers"] = ml_entities["account_numbers"]
@@ -250,8 +311,18 @@ class FieldExtractor:
             
         except Exception as e:
             error_msg = f"Ошибка при ML извлечении сущностей: {e}"
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(error_msg)
             raise RuntimeError(error_msg) from e
 
+
+
+# Глобальный экземпляр экстрактора полей
+_field_extractor_instance = None
+
+
+def get_field_extractor() -> FieldExtractor:
+    """Получает глобальный экземпляр экстрактора полей"""
+    global _field_extractor_instance
+    if _field_extractor_instance is None:
+        _field_extractor_instance = FieldExtractor()
+    return _field_extractor_instance
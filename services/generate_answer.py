@@ -4,6 +4,7 @@
 Использует системный промпт и шаблоны по типам писем
 """
 
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Optional
 from generator import YandexGPTGenerator, get_generator, generate_reply
@@ -20,10 +21,13 @@ CLASSIFICATION_TO_TEMPLATE = {
 }
 
 
+@lru_cache(maxsize=32)
 def load_template(classification: str) -> Optional[str]:
     """
     Загружает шаблон для конкретного типа письма
     
+    Файл читается один раз на тип письма; для перечитывания вызовите load_template.cache_clear().
+    
     :param classification: Тип письма (из ML модели)
     :return: Содержимое шаблона или None
     """
@@ -58,11 +62,12 @@ def load_system_prompt() -> str:
     return load_default()
 
 
-def generate_answer(
+async def generate_answer(
     text: str,
     classification: str,
     fields: Optional[Dict] = None,
-    generator: Optional[YandexGPTGenerator] = None
+    generator: Optional[YandexGPTGenerator] = None,
+    confidence: Optional[float] = None
 ) -> str:
     """
     Генерирует ответ на письмо через Yandex Cloud LLM
@@ -74,7 +79,8 @@ def generate_answer(
     :param text: Текст входящего письма
     :param classification: Тип письма (Official Complaint or Claim, Regulatory Request, Partnership Proposal, Information/Document Request, Notification or Information, Approval Request)
     :param fields: Извлеченные поля из письма (даты, номера договоров, суммы и т.д.)
-    :param generator: Экземпляр генератора (если None, создается новый)
+    :param generator: Экземпляр генератора (если None, используется общий)
+    :param confidence: Уверенность классификатора (для шаблонных ответов на типовые письма)
     :return: Сгенерированный ответ
     """
     if fields is None:
@@ -91,12 +97,13 @@ def generate_answer(
         system_prompt = f"{system_prompt}\n\n## Шаблон для типа письма '{classification}':\n\n{template}"
     
     # Используем generate_reply с кастомным системным промптом
-    return generate_reply(
+    return await generate_reply(
         text=text,
         classification=classification,
         fields=fields,
         generator=generator,
-        system_prompt_override=system_prompt
+        system_prompt_override=system_prompt,
+        confidence=confidence
     )
 
 
@@ -1,10 +1,12 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import List, Optional
 
 from generator import YandexGPTGenerator, get_generator, generate_reply
 from models.letter import LetterStyle
+from services.ml_batcher import get_ml_batcher
 from services.ml_classifier import get_ml_classifier
-from services.field_extractor import FieldExtractor
+from services.field_extractor import get_field_extractor
 from domain.letters import LetterType, to_letter_type, get_letter_style, get_reply_deadline_days
 
 
@@ -13,9 +15,9 @@ class LetterProcessor:
     
     def __init__(self, generator: Optional[YandexGPTGenerator] = None):
         self.generator = generator or get_generator()
-        self.field_extractor = FieldExtractor()
+        self.field_extractor = get_field_extractor()
     
-    def process_letter(
+    async def process_letter(
         self,
         text: str,
         sender_name: Optional[str] = None,
@@ -34,25 +36,32 @@ class LetterProcessor:
         Returns:
             dict с данными для сохранения в БД
         """
-        ml_classifier = get_ml_classifier()
-        classification_result = ml_classifier.classify(text)
+        # Классификация (пачками через батчер) и извлечение полей независимы: выполняем параллельно
+        classification_result, fields = await asyncio.gather(
+            get_ml_batcher().submit(text),
+            asyncio.to_thread(self.field_extractor.extract_all, text)
+        )
+        return await self._build_letter(
+            text, classification_result, fields, sender_name, letter_style, reply_deadline_days
+        )
+    
+    async def _build_letter(
+        self,
+        text: str,
+        classification_result: dict,
+        fields: dict,
+        sender_name: Optional[str],
+        letter_style: Optional[LetterStyle],
+        reply_deadline_days: Optional[int]
+    ) -> dict:
+        """Дополняет классификацию и поля письма сроками и стилем, генерирует ответ"""
         classification = classification_result["type"]
         letter_type: LetterType = to_letter_type(classification)
         classification_confidence = classification_result.get("confidence", 0.7)
         urgency = classification_result.get("urgency", "medium")
         tone = classification_result.get("tone", "formal")
-        entities = classification_result.get("entities", {})
-        
-        fields = self.field_extractor.extract_all(text)
-        
-        if entities:
-            if entities.get("dates"):
-                fields["dates"] = list(set(fields.get("dates", []) + entities["dates"]))
-            if entities.get("contract_numbers"):
-                fields["contract_numbers"] = list(set(fields.get("contract_numbers", []) + entities["contract_numbers"]))
-            if entities.get("names") and not fields.get("sender_name"):
-                fields["sender_name"] = entities["names"][0] if entities["names"] else None
         
+        # Сущности ML (даты, договоры, имена) уже объединены с полями в extract_all
         if not sender_name and fields.get("sender_name"):
             sender_name = fields["sender_name"]
         
@@ -65,11 +74,12 @@ class LetterProcessor:
         received_date = datetime.now(timezone.utc)
         reply_deadline = received_date + timedelta(days=reply_deadline_days)
         
-        generated_answer = generate_reply(
+        generated_answer = await generate_reply(
             text=text,
             classification=classification,
             fields=fields,
-            generator=self.generator
+            generator=self.generator,
+            confidence=classification_confidence
         )
         
         return {
@@ -85,4 +95,50 @@ class LetterProcessor:
             "tone": tone,
             "extracted_fields": fields
         }
+    
+    async def process_letters_batch(
+        self,
+        texts: List[str],
+        letter_style: Optional[LetterStyle] = None,
+        reply_deadline_days: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Обрабатывает несколько писем (например, при загрузке почтового ящика)
+        
+        Вся пачка классифицируется одним вызовом MLClassifier.classify_batch, минуя батчер:
+        большие пачки предобрабатываются в пуле процессов. Поля извлекаются параллельно
+        классификации, ответы генерируются одновременно для всех писем.
+        
+        Args:
+            texts: Тексты входящих писем
+            letter_style: Стиль писем (если не указан, определяется для каждого письма)
+            reply_deadline_days: Количество дней до срока ответа (по умолчанию зависит от типа письма)
+        
+        Returns:
+            list с данными для сохранения в БД в порядке texts
+        """
+        if not texts:
+            return []
+        
+        ml_classifier = await asyncio.to_thread(get_ml_classifier)
+        classification_results, fields_list = await asyncio.gather(
+            asyncio.to_thread(ml_classifier.classify_batch, texts, with_entities=False),
+            asyncio.gather(*(asyncio.to_thread(self.field_extractor.extract_all, text) for text in texts))
+        )
+        return list(await asyncio.gather(*(
+            self._build_letter(text, classification_result, fields, None, letter_style, reply_deadline_days)
+            for text, classification_result, fields in zip(texts, classification_results, fields_list)
+        )))
+
+
+
+# Глобальный экземпляр обработчика писем
+_letter_processor_instance = None
+
 
+def get_letter_processor() -> LetterProcessor:
+    """Получает глобальный экземпляр обработчика писем"""
+    global _letter_processor_instance
+    if _letter_processor_instance is None:
+        _letter_processor_instance = LetterProcessor()
+    return _letter_processor_instance
@@ -0,0 +1,128 @@
+"""
+Микро-батчинг запросов к ML классификатору
+
+Письма, пришедшие почти одновременно, классифицируются одним вызовом
+MLClassifier.classify_batch: векторизация и predict_proba выполняются над матрицей,
+а не по одному тексту. Сущности здесь не извлекаются: вызывающий код получает их
+вместе с полями из FieldExtractor.extract_all.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from services.ml_classifier import get_ml_classifier
+
+logger = logging.getLogger(__name__)
+
+
+class MLBatcher:
+    """Собирает тексты в пачки и классифицирует их в отдельном потоке"""
+
+    def __init__(self, flush_every: int = 32, flush_interval_ms: int = 15):
+        """
+        Args:
+            flush_every: Максимальный размер пачки
+            flush_interval_ms: Сколько ждать пополнения пачки после первого текста, мс
+        """
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        """Запускает фоновую задачу (в работающем event loop)"""
+        loop = asyncio.get_running_loop()
+        # Очередь и задача привязаны к своему event loop: в новом loop запускаемся заново
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу; ожидающие запросы получают ошибку"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("ML классификатор остановлен"))
+
+    async def submit(self, text: str) -> Dict:
+        """
+        Классифицирует текст в составе ближайшей пачки
+
+        :param text: Текст письма
+        :return: Словарь с классификацией (как MLClassifier.classify, с пустым "entities")
+        :raises RuntimeError: Если ML модели недоступны или классификация не удалась
+        """
+        self.start()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Ждет первый текст, затем добирает пачку до flush_every или до истечения интервала"""
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.flush_every:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # Клиент мог отключиться, пока текст ждал в очереди
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                ml_classifier = await asyncio.to_thread(get_ml_classifier)
+                results = await asyncio.to_thread(
+                    ml_classifier.classify_batch, [text for text, _ in batch], with_entities=False
+                )
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("ML классификатор остановлен"))
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка пакетной ML классификации ({len(batch)} писем): {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# Глобальный экземпляр батчера
+_ml_batcher_instance: Optional[MLBatcher] = None
+
+
+def get_ml_batcher() -> MLBatcher:
+    """Получает глобальный экземпляр батчера ML классификации"""
+    global _ml_batcher_instance
+    if _ml_batcher_instance is None:
+        _ml_batcher_instance = MLBatcher()
+    return _ml_batcher_instance
+
+
+async def close_ml_batcher() -> None:
+    """Останавливает глобальный батчер (вызывается при остановке приложения)"""
+    if _ml_batcher_instance is not None:
+        await _ml_batcher_instance.stop()
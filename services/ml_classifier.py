@@ -3,17 +3,20 @@ ML классификатор писем с использованием обу
 ТОЛЬКО ML, без fallback - выбрасывает ошибки если ML недоступен
 """
 
+import multiprocessing
 import os
-import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import logging
 
-logger = logging.getLogger(__name__)
+import numpy as np
+
+from core.config import settings
 
-data_processing_path = Path(__file__).parent.parent / "data_processing"
-if data_processing_path.exists():
-    sys.path.insert(0, str(data_processing_path.parent))
+logger = logging.getLogger(__name__)
 
 try:
     import joblib
@@ -22,15 +25,11 @@ except ImportError:
     ML_AVAILABLE = False
     joblib = None
 
+# Корень проекта уже в sys.path (из него импортирован пакет services), data_processing
+# импортируется как пакет без правки sys.path
 try:
     if ML_AVAILABLE:
-        data_processing_path = Path(__file__).parent.parent / "data_processing"
-        if data_processing_path.exists():
-            sys.path.insert(0, str(data_processing_path.parent))
-            from data_processing.preprocessing import enhanced_preprocess_text, extract_entities
-        else:
-            enhanced_preprocess_text = None
-            extract_entities = None
+        from data_processing.preprocessing import enhanced_preprocess_text, extract_entities
     else:
         enhanced_preprocess_text = None
         extract_entities = None
@@ -38,6 +37,53 @@ except ImportError:
     enhanced_preprocess_text = None
     extract_entities = None
 
+# Единый файл моделей, который сохраняет data_processing/training.py
+BUNDLE_FILE = 'bundle.pkl'
+
+# Предобработка (pymorphy3) держит GIL: пачки от PREPROCESS_POOL_MIN_BATCH текстов
+# обрабатываются в пуле процессов. Мелкие пачки батчера дешевле обработать на месте
+PREPROCESS_POOL_MIN_BATCH = 256
+PREPROCESS_CHUNKSIZE = 16
+
+_preprocess_pool: Optional[ProcessPoolExecutor] = None
+_preprocess_pool_lock = threading.Lock()
+
+
+def _get_preprocess_pool() -> ProcessPoolExecutor:
+    """
+    Пул процессов предобработки (создается при первой большой пачке).
+    Нужен только process_letters_batch: одиночные письма и пачки батчера меньше порога.
+    Пул свой в каждом воркере uvicorn, поэтому его размер — доля ядер на воркер
+    (settings.preprocess_worker_count)
+    """
+    global _preprocess_pool
+    if _preprocess_pool is None:
+        with _preprocess_pool_lock:
+            if _preprocess_pool is None:
+                # spawn: fork процесса с потоками (asyncio.to_thread, uvicorn) небезопасен
+                _preprocess_pool = ProcessPoolExecutor(
+                    max_workers=settings.preprocess_worker_count,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _preprocess_pool
+
+
+def _preprocess_texts(texts: List[str]) -> List[str]:
+    """Предобрабатывает тексты для векторизаторов; большие пачки — параллельно по ядрам"""
+    if len(texts) < PREPROCESS_POOL_MIN_BATCH or settings.preprocess_worker_count < 2:
+        return [enhanced_preprocess_text(text, remove_personal_data_flag=True) for text in texts]
+    preprocess = partial(enhanced_preprocess_text, remove_personal_data_flag=True)
+    return list(_get_preprocess_pool().map(preprocess, texts, chunksize=PREPROCESS_CHUNKSIZE))
+
+
+def close_preprocess_pool() -> None:
+    """Останавливает пул процессов предобработки, если он был создан"""
+    global _preprocess_pool
+    with _preprocess_pool_lock:
+        if _preprocess_pool is not None:
+            _preprocess_pool.shutdown(cancel_futures=True)
+            _preprocess_pool = None
+
 
 class MLClassifier:
     """ML классификатор - ТОЛЬКО ML, без fallback"""
@@ -78,30 +124,56 @@ class MLClassifier:
             models = {}
             missing_models = []
             
-            for task_name in tasks:
-                vectorizer_path = os.path.join(self.models_dir, f'vectorizer_{task_name}.pkl')
-                classifier_path = os.path.join(self.models_dir, f'classifier_{task_name}.pkl')
-                
-                if os.path.exists(vectorizer_path) and os.path.exists(classifier_path):
-                    vectorizer = joblib.load(vectorizer_path)
-                    classifier = joblib.load(classifier_path)
-                    models[task_name] = {
-                        'vectorizer': vectorizer,
-                        'classifier': classifier
-                    }
-                else:
-                    missing_models.append(task_name)
+            bundle_path = os.path.join(self.models_dir, BUNDLE_FILE)
+            if os.path.exists(bundle_path):
+                # Новый формат: один файл, массивы моделей отображаются в память через mmap
+                bundle = joblib.load(bundle_path, mmap_mode='r')
+                for task_name in tasks:
+                    classifier = bundle['classifiers'].get(task_name)
+                    if classifier is not None:
+                        models[task_name] = {
+                            'vectorizer': bundle['vectorizer'],
+                            'classifier': classifier
+                        }
+                    else:
+                        missing_models.append(task_name)
+            else:
+                # Старый формат: отдельные векторизатор и классификатор на задачу
+                # (массивы тоже через mmap: воркеры делят одну копию в page cache)
+                for task_name in tasks:
+                    vectorizer_path = os.path.join(self.models_dir, f'vectorizer_{task_name}.pkl')
+                    classifier_path = os.path.join(self.models_dir, f'classifier_{task_name}.pkl')
+                    
+                    if os.path.exists(vectorizer_path) and os.path.exists(classifier_path):
+                        vectorizer = joblib.load(vectorizer_path, mmap_mode='r')
+                        classifier = joblib.load(classifier_path, mmap_mode='r')
+                        # Одинаковые векторизаторы разных задач заменяем одним объектом:
+                        # тогда текст векторизуется один раз на все такие задачи
+                        for loaded in models.values():
+                            if self._same_vectorizer(loaded['vectorizer'], vectorizer):
+                                vectorizer = loaded['vectorizer']
+                                break
+                        models[task_name] = {
+                            'vectorizer': vectorizer,
+                            'classifier': classifier
+                        }
+                    else:
+                        missing_models.append(task_name)
             
             if missing_models:
                 error_msg = (
                     f"Модели не найдены для задач: {', '.join(missing_models)}\n"
                     f"Ожидаемые файлы в {self.models_dir}:\n"
-                    f"  - vectorizer_{missing_models[0]}.pkl и classifier_{missing_models[0]}.pkl\n"
+                    f"  - {BUNDLE_FILE} (или vectorizer_{missing_models[0]}.pkl и classifier_{missing_models[0]}.pkl)\n"
                     f"Обучите модели: запустите data_processing/training.py"
                 )
                 logger.error(error_msg)
                 raise RuntimeError(error_msg)
             
+            # predict_proba есть не у всех классификаторов: проверяем один раз при загрузке
+            for model_data in models.values():
+                model_data['predict_proba'] = getattr(model_data['classifier'], 'predict_proba', None)
+            
             self.models = models
             self.ml_available = True
             logger.info("✓ ML модели загружены успешно")
@@ -116,6 +188,18 @@ class MLClassifier:
             logger.error(error_msg)
             raise RuntimeError(error_msg) from e
     
+    @staticmethod
+    def _same_vectorizer(first, second) -> bool:
+        """Проверяет, что векторизаторы дают одинаковые матрицы (параметры, словарь, idf)"""
+        if type(first) is not type(second) or first.get_params() != second.get_params():
+            return False
+        if getattr(first, 'vocabulary_', None) != getattr(second, 'vocabulary_', None):
+            return False
+        first_idf, second_idf = getattr(first, 'idf_', None), getattr(second, 'idf_', None)
+        if first_idf is None or second_idf is None:
+            return first_idf is second_idf
+        return np.array_equal(first_idf, second_idf)
+    
     def classify(self, text: str) -> Dict:
         """
         Классифицирует письмо используя ТОЛЬКО ML модели
@@ -124,6 +208,64 @@ class MLClassifier:
         :return: Словарь с классификацией
         :raises RuntimeError: Если ML модели не загружены или недоступны
         """
+        self._ensure_loaded()
+        return self._classify_with_ml(text)
+    
+    def classify_batch(self, texts: List[str], with_entities: bool = True) -> List[Dict]:
+        """
+        Классифицирует несколько писем за один проход моделей
+        
+        Тексты векторизуются одной матрицей, predict_proba вызывается один раз на задачу.
+        
+        :param texts: Тексты писем
+        :param with_entities: Извлекать ли сущности (False — если их уже извлекает FieldExtractor.extract_all)
+        :return: Словари с классификацией в порядке texts
+        :raises RuntimeError: Если ML модели не загружены или недоступны
+        """
+        self._ensure_loaded()
+        self._ensure_preprocessing()
+        if not texts:
+            return []
+        
+        try:
+            processed = _preprocess_texts(texts)
+            classifications = [{} for _ in texts]
+            # Общий векторизатор (bundle или совпавшие файлы задач): матрица считается один раз
+            vectors = {}
+            
+            for task_name, model_data in self.models.items():
+                vectorizer = model_data['vectorizer']
+                matrix = vectors.get(id(vectorizer))
+                if matrix is None:
+                    matrix = vectors[id(vectorizer)] = vectorizer.transform(processed)
+                
+                classifier = model_data['classifier']
+                predict_proba = model_data['predict_proba']
+                if predict_proba is not None:
+                    probabilities = predict_proba(matrix)
+                    best = np.argmax(probabilities, axis=1)
+                    predictions = classifier.classes_[best]
+                    confidences = probabilities[np.arange(len(texts)), best]
+                else:
+                    predictions = classifier.predict(matrix)
+                    confidences = [0.8] * len(texts)  # Дефолтная уверенность
+                
+                for classification, prediction, confidence in zip(classifications, predictions, confidences):
+                    classification[task_name] = prediction
+                    classification[f"{task_name}_confidence"] = float(confidence)
+            
+            return [
+                self._build_result(classification, extract_entities(text) if with_entities else {})
+                for classification, text in zip(classifications, texts)
+            ]
+            
+        except Exception as e:
+            error_msg = f"Ошибка при ML классификации: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg) from e
+    
+    def _ensure_loaded(self):
+        """Проверяет, что модели загружены"""
         if not self.ml_available or not self.models:
             error_msg = (
                 "ML модели не загружены. Убедитесь, что:\n"
@@ -133,17 +275,10 @@ class MLClassifier:
             )
             logger.error(error_msg)
             raise RuntimeError(error_msg)
-        
-        return self._classify_with_ml(text)
     
-    def _classify_with_ml(self, text: str) -> Dict:
-        """
-        Классификация с использованием ML моделей
-        
-        :param text: Текст письма
-        :return: Словарь с классификацией
-        :raises RuntimeError: Если preprocessing функции недоступны или произошла ошибка
-        """
+    @staticmethod
+    def _ensure_preprocessing():
+        """Проверяет, что функции предобработки импортированы"""
         if enhanced_preprocess_text is None or extract_entities is None:
             error_msg = (
                 "preprocessing функции недоступны. Убедитесь, что:\n"
@@ -152,27 +287,54 @@ class MLClassifier:
             )
             logger.error(error_msg)
             raise RuntimeError(error_msg)
+    
+    @staticmethod
+    def _build_result(classification: Dict, entities: Dict) -> Dict:
+        """Собирает ответ классификатора из предсказаний по задачам"""
+        return {
+            "type": classification.get("type", "Approval Request"),
+            "confidence": classification.get("type_confidence", 0.7),
+            "urgency": classification.get("urgency", "medium"),
+            "urgency_confidence": classification.get("urgency_confidence", 0.7),
+            "tone": classification.get("tone", "formal"),
+            "tone_confidence": classification.get("tone_confidence", 0.7),
+            "entities": entities
+        }
+    
+    def _classify_with_ml(self, text: str) -> Dict:
+        """
+        Классификация с использованием ML моделей
+        
+        :param text: Текст письма
+        :return: Словарь с классификацией
+        :raises RuntimeError: Если preprocessing функции недоступны или произошла ошибка
+        """
+        self._ensure_preprocessing()
         
         try:
             classification = {}
+            # Предобработка одна на все задачи; вектор считается один раз на каждый векторизатор
+            processed_text = enhanced_preprocess_text(text, remove_personal_data_flag=True)
+            vectors = {}
             
             for task_name, model_data in self.models.items():
-                # Предобработка текста
-                processed_text = enhanced_preprocess_text(text, remove_personal_data_flag=True)
-                
                 # Векторизация
                 vectorizer = model_data['vectorizer']
-                text_vector = vectorizer.transform([processed_text])
+                text_vector = vectors.get(id(vectorizer))
+                if text_vector is None:
+                    text_vector = vectors[id(vectorizer)] = vectorizer.transform([processed_text])
                 
-                # Классификация
+                # Классификация: метка и уверенность из одного вызова predict_proba
+                # (argmax вероятностей совпадает с predict, decision_function считается один раз)
                 classifier = model_data['classifier']
-                prediction = classifier.predict(text_vector)[0]
-                
-                # Получаем вероятность (если доступна)
-                if hasattr(classifier, 'predict_proba'):
-                    probabilities = classifier.predict_proba(text_vector)[0]
-                    confidence = float(max(probabilities))
+                predict_proba = model_data['predict_proba']
+                if predict_proba is not None:
+                    probabilities = predict_proba(text_vector)[0]
+                    best = int(np.argmax(probabilities))
+                    prediction = classifier.classes_[best]
+                    confidence = float(probabilities[best])
                 else:
+                    prediction = classifier.predict(text_vector)[0]
                     confidence = 0.8  # Дефолтная уверенность
                 
                 classification[task_name] = prediction
@@ -181,15 +343,7 @@ class MLClassifier:
             # Извлекаем сущности
             entities = extract_entities(text) if extract_entities else {}
             
-            return {
-                "type": classification.get("type", "Approval Request"),
-                "confidence": classification.get("type_confidence", 0.7),
-                "urgency": classification.get("urgency", "medium"),
-                "urgency_confidence": classification.get("urgency_confidence", 0.7),
-                "tone": classification.get("tone", "formal"),
-                "tone_confidence": classification.get("tone_confidence", 0.7),
-                "entities": entities
-            }
+            return self._build_result(classification, entities)
             
         except Exception as e:
             error_msg = f"Ошибка при ML классификации: {e}"
@@ -199,12 +353,21 @@ class MLClassifier:
 
 # Глобальный экземпляр классификатора
 _ml_classifier_instance = None
+# Модели загружаются один раз: параллельные вызовы ждут завершения уже идущей загрузки
+_ml_classifier_lock = threading.Lock()
 
 
 def get_ml_classifier() -> MLClassifier:
-    """Получает глобальный экземпляр ML классификатора"""
+    """
+    Получает глобальный экземпляр ML классификатора
+
+    Первый вызов загружает модели (несколько секунд); из асинхронного кода вызывайте
+    через asyncio.to_thread, чтобы не блокировать event loop.
+    """
     global _ml_classifier_instance
     if _ml_classifier_instance is None:
-        _ml_classifier_instance = MLClassifier()
+        with _ml_classifier_lock:
+            if _ml_classifier_instance is None:
+                _ml_classifier_instance = MLClassifier()
     return _ml_classifier_instance
 
@@ -0,0 +1,23 @@
+"""
+Тесты поиска сущностей в тексте письма
+"""
+
+import unittest
+
+from data_processing.preprocessing import extract_entities, remove_personal_data
+
+
+class ExtractEntitiesTest(unittest.TestCase):
+    def test_overlapping_contract_and_account(self):
+        # Номер договора одновременно подходит под паттерн счета
+        text = "Счет 40817810099910004312345, договор №АБ-1234567890123456"
+        entities = extract_entities(text)
+        self.assertEqual(entities['account_numbers'], ["40817810099910004312345", "1234567890123456"])
+
+    def test_contract_order(self):
+        entities = extract_entities("договор №А-1 и №Б-2")
+        self.assertEqual(entities['contract_numbers'], ["№А-1", "№Б-2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Тесты схем запросов: проверка email адреса и длины текста
+"""
+
+import unittest
+
+from pydantic import ValidationError
+
+from generator.prompts import _HARD_INPUT_CHARS
+from schemas.history import GenerateRequest
+from schemas.letter import MAX_LETTER_TEXT_CHARS, LetterRequest
+
+
+class SenderEmailTest(unittest.TestCase):
+    def test_valid_email(self):
+        request = LetterRequest(text="Текст", sender_email="client@example.ru")
+        self.assertEqual(request.sender_email, "client@example.ru")
+
+    def test_trailing_newline_rejected(self):
+        # Перевод строки попал бы в заголовок To при отправке ответа
+        for value in ("a@b.c\n", "a@b.c\r\n", "a@b.c\nBcc: x@y.z"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValidationError):
+                    LetterRequest(text="Текст", sender_email=value)
+
+    def test_missing_at_rejected(self):
+        with self.assertRaises(ValidationError):
+            LetterRequest(text="Текст", sender_email="client.example.ru")
+
+
+class TextLengthTest(unittest.TestCase):
+    def test_limit_matches_generator(self):
+        self.assertEqual(MAX_LETTER_TEXT_CHARS, _HARD_INPUT_CHARS)
+
+    def test_too_long_text_rejected(self):
+        # Длинное письмо отклоняется валидацией (422), а не ValueError в generate_reply (500)
+        for schema in (LetterRequest, GenerateRequest):
+            with self.subTest(schema=schema.__name__):
+                schema(text="а" * MAX_LETTER_TEXT_CHARS)
+                with self.assertRaises(ValidationError):
+                    schema(text="а" * (MAX_LETTER_TEXT_CHARS + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()